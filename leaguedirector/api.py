@@ -4,14 +4,40 @@ import json
 import copy
 import logging
 import functools
-from leaguedirector.widgets import userpath
+from leaguedirector.widgets import userpath, schedule, Throttle
+from leaguedirector.monitor import monitor
 from PySide6.QtCore import *
 from PySide6.QtNetwork import *
 
+# Seeks per second sent while the timeline slider is being dragged
+SCRUB_RATE = 8
+
+# Camera writes per second while a camera motion key is held, and how long
+# a held key may go without repeating before it is treated as released
+MOTION_RATE = 30
+MOTION_TIMEOUT = 1.0
+
+# Attempts a render queue job gets, seconds the game may take to start a
+# recording, and seconds a recording may go without progress, before the
+# attempt counts as failed
+RENDER_ATTEMPTS = 3
+RENDER_START_TIMEOUT = 30
+RENDER_STALL_TIMEOUT = 120
+
+
+class Field(QObject):
+    """
+    Observable for a single resource field.
+    """
+    changed = Signal(object)
+
 
 class Resource(QObject):
     """
-    Base class for a remote api resources.
+    Base class for a remote api resources. Names of fields that changed,
+    either locally or in an applied response, are collected in changed
+    until the next updated signal has been delivered, after which each
+    changed field's observable is notified with its new value.
     """
     updated     = Signal()
     host        = 'https://127.0.0.1:2999'
@@ -24,6 +50,8 @@ class Resource(QObject):
 
     def __init__(self):
         super(Resource, self).__setattr__('timestamp', time.time())
+        super(Resource, self).__setattr__('changed', set())
+        super(Resource, self).__setattr__('observers', {})
         for name, default in self.fields.items():
             super(Resource, self).__setattr__(name, default)
         QObject.__init__(self)
@@ -34,6 +62,7 @@ class Resource(QObject):
                 raise AttributeError("Resource is readonly")
             if getattr(self, name) != value:
                 super(Resource, self).__setattr__(name, value)
+                self.changed.add(name)
                 self.update({name: value})
         else:
             super(Resource, self).__setattr__(name, value)
@@ -61,6 +90,25 @@ class Resource(QObject):
     def get(self, name):
         return getattr(self, name)
 
+    def assign(self, data):
+        if self.readonly:
+            raise AttributeError("Resource is readonly")
+        for name, value in data.items():
+            super(Resource, self).__setattr__(name, value)
+            self.changed.add(name)
+        return self.update(data)
+
+    def field(self, name):
+        if name not in self.observers:
+            self.observers[name] = Field()
+        return self.observers[name]
+
+    def notify(self):
+        changed, self.changed = self.changed, set()
+        for name in changed:
+            if name in self.observers:
+                monitor.measure('{}.{}'.format(type(self).__name__, name), self.observers[name].changed.emit, getattr(self, name))
+
     def shutdown(self):
         pass
 
@@ -77,7 +125,8 @@ class Resource(QObject):
             response = self.manager().post(request, QByteArray(json.dumps(data).encode()))
         else:
             response = self.manager().get(request)
-        response.finished.connect(functools.partial(self.finished, response))
+        response.finished.connect(monitor.wrap(functools.partial(self.finished, response), '{}.finished'.format(type(self).__name__)))
+        return response
 
     def finished(self, response):
         error = response.error()
@@ -89,13 +138,15 @@ class Resource(QObject):
             Resource.connected = False
         else:
             logging.error("Request Failed: {} {}".format(self.url, response.errorString()))
-        self.updated.emit()
+        monitor.measure('{}.updated'.format(type(self).__name__), self.updated.emit)
+        self.notify()
 
     def apply(self, data):
         if not self.writeonly:
             for key, value in data.items():
-                if key in self.fields:
+                if key in self.fields and getattr(self, key) != value:
                     super(Resource, self).__setattr__(key, value)
+                    self.changed.add(key)
 
 
 class Game(Resource):
@@ -196,9 +247,7 @@ class Render(Resource):
         self.cameraMoveBackY = None
         self.cameraMoveBackZ = None
         self.cameraMoveBackLast = None
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.updateCameraMoveBack)
-        self.timer.start(600)
+        self.timer = schedule(600, self.updateCameraMoveBack)
 
     def updateCameraMoveBack(self, *args):
         # Wait until the camera stops moving before snapping it
@@ -238,6 +287,100 @@ class Render(Resource):
         self.cameraRotation = copy
 
 
+class CameraMotion(QObject):
+    """
+    Moves the camera for as long as a motion key is held. Every tick the
+    speed in units per second is integrated over the time elapsed since the
+    last one, and the new position, rotation and field of view go out in a
+    single write. While a write is in flight further motion accumulates
+    and is sent with the next tick.
+    """
+    motions = {
+        'camera_up':            ('cameraPosition', 'y', 1),
+        'camera_down':          ('cameraPosition', 'y', -1),
+        'camera_yaw_left':      ('cameraRotation', 'x', -1),
+        'camera_yaw_right':     ('cameraRotation', 'x', 1),
+        'camera_pitch_up':      ('cameraRotation', 'y', -1),
+        'camera_pitch_down':    ('cameraRotation', 'y', 1),
+        'camera_roll_left':     ('cameraRotation', 'z', 1),
+        'camera_roll_right':    ('cameraRotation', 'z', -1),
+        'camera_fov_up':        ('fieldOfView', None, 1),
+        'camera_fov_down':      ('fieldOfView', None, -1),
+    }
+
+    def __init__(self, render):
+        QObject.__init__(self)
+        self.render = render
+        self.speeds = {
+            'cameraPosition': 200.0,
+            'cameraRotation': 30.0,
+            'fieldOfView': 20.0,
+        }
+        self.held = {}
+        self.target = None
+        self.inflight = False
+        self.last = 0
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(1000 / MOTION_RATE))
+        self.timer.timeout.connect(self.tick)
+
+    def keybindings(self):
+        return {action : functools.partial(self.press, action) for action in self.motions}
+
+    def setSpeed(self, field, speed):
+        self.speeds[field] = speed
+
+    def restoreSettings(self, data):
+        for field, speed in data.items():
+            if field in self.speeds:
+                self.speeds[field] = speed
+
+    def saveSettings(self):
+        return dict(self.speeds)
+
+    def press(self, action):
+        if not self.held:
+            self.last = time.time()
+            self.timer.start()
+        self.held[action] = time.time()
+
+    def release(self, action):
+        if action in self.held:
+            self.tick()
+            self.held.pop(action, None)
+
+    def tick(self):
+        now = time.time()
+        elapsed, self.last = now - self.last, now
+        target = self.target or {}
+        for action in list(self.held):
+            field, axis, direction = self.motions[action]
+            if field not in target:
+                target[field] = copy.deepcopy(getattr(self.render, field))
+            delta = direction * self.speeds[field] * elapsed
+            if axis is None:
+                target[field] += delta
+            else:
+                target[field][axis] += delta
+            if now - self.held[action] > MOTION_TIMEOUT:
+                del self.held[action]
+        if not self.held:
+            self.timer.stop()
+        self.target = target or None
+        self.send()
+
+    def send(self):
+        if self.target is not None and not self.inflight:
+            data, self.target = self.target, None
+            self.inflight = True
+            self.render.assign(data).finished.connect(self.sent)
+
+    def sent(self):
+        self.inflight = False
+        if not self.timer.isActive():
+            self.send()
+
+
 class Particles(Resource):
     url = '/replay/particles'
     fields = {}
@@ -261,6 +404,12 @@ class Particles(Resource):
 
 
 class Playback(Resource):
+    """
+    Seeks are coalesced: while one is in flight or the game reports it is
+    still seeking only the latest requested target is kept, and it is sent
+    once the game is done. Scrubbing is additionally limited to SCRUB_RATE
+    seeks per second.
+    """
     url = '/replay/playback'
     fields = {
         'paused':   False,
@@ -270,8 +419,18 @@ class Playback(Resource):
         'length':   1.0,
     }
 
+    def __init__(self):
+        Resource.__init__(self)
+        self.target = None
+        self.inflight = False
+        self.scrubber = Throttle(self.request, self)
+        self.scrubber.setRate(SCRUB_RATE)
+        self.field('seeking').changed.connect(self.sendTarget)
+
     @property
     def currentTime(self):
+        if self.target is not None and 'time' in self.target:
+            return self.target['time']
         if self.paused:
             return self.time
         else:
@@ -283,27 +442,52 @@ class Playback(Resource):
         return '{0:02}:{1:05.2f}'.format(int(minutes), seconds)
 
     def togglePlay(self):
-        self.paused = not self.paused
+        paused = (self.target or {}).get('paused', self.paused)
+        self.request(paused=not paused)
 
     def setSpeed(self, speed):
         self.speed = speed
 
     def adjustTime(self, delta):
-        self.time = self.currentTime + delta
+        self.seek(self.currentTime + delta)
 
     def play(self, time=None):
-        if not self.seeking:
-            data = {'paused': False}
-            if time is not None:
-                data['time'] = time
-            self.update(data)
+        self.seek(time, False)
 
     def pause(self, time=None):
-        if not self.seeking:
-            data = {'paused': True}
-            if time is not None:
-                data['time'] = time
-            self.update(data)
+        self.seek(time, True)
+
+    def seek(self, time=None, paused=None):
+        self.scrubber.cancel()
+        self.request(time, paused)
+
+    def scrub(self, time):
+        self.scrubber.push(time)
+
+    def request(self, time=None, paused=None):
+        target = dict(self.target or {})
+        if time is not None:
+            target['time'] = max(min(time, self.length), 0)
+        if paused is not None:
+            target['paused'] = paused
+        if target:
+            self.target = target
+            self.sendTarget()
+
+    def sendTarget(self, *args):
+        if self.target is not None and not self.inflight and not self.seeking:
+            data, self.target = self.target, None
+            for name, value in data.items():
+                super(Resource, self).__setattr__(name, value)
+            self.timestamp = time.time()
+            response = self.update(data)
+            if 'time' in data:
+                self.inflight = True
+                response.finished.connect(self.targetSent)
+
+    def targetSent(self):
+        self.inflight = False
+        self.sendTarget()
 
 
 class Sequence(Resource):
@@ -388,13 +572,13 @@ class Sequence(Resource):
         self.directory = None
         self.sequencing = False
         self.saveRemoteTimer = QTimer()
-        self.saveRemoteTimer.timeout.connect(self.saveRemoteNow)
+        self.saveRemoteTimer.timeout.connect(monitor.wrap(self.saveRemoteNow))
         self.saveRemoteTimer.setSingleShot(True)
         self.saveHistoryTimer = QTimer()
-        self.saveHistoryTimer.timeout.connect(self.saveHistoryNow)
+        self.saveHistoryTimer.timeout.connect(monitor.wrap(self.saveHistoryNow))
         self.saveHistoryTimer.setSingleShot(True)
         self.saveFileTimer = QTimer()
-        self.saveFileTimer.timeout.connect(self.saveFileNow)
+        self.saveFileTimer.timeout.connect(monitor.wrap(self.saveFileNow))
         self.saveFileTimer.setSingleShot(True)
 
     def update(self, *args):
@@ -670,3 +854,235 @@ class Sequence(Resource):
             return self.render.depthOfFieldMid
         if name == 'depthOfFieldFar':
             return self.render.depthOfFieldFar
+
+
+class RenderQueue(QObject):
+    """
+    Records a list of sequence jobs back to back without an operator. Each
+    job loads and applies its sequence, seeks to the start of its range,
+    starts the recording once the game has reported the seek finished and
+    watches the Recording resource until it finishes. Failed attempts are retried up to RENDER_ATTEMPTS times. The
+    jobs and their state are journaled to disk on every change, so after a
+    restart a queue that was running resumes with the first unfinished job
+    once the game is connected again.
+    """
+    changed = Signal()
+
+    def __init__(self, game, playback, recording, sequence):
+        QObject.__init__(self)
+        self.game = game
+        self.playback = playback
+        self.recording = recording
+        self.sequence = sequence
+        self.path = userpath('queue.json')
+        self.jobs = []
+        self.active = False
+        self.job = None
+        self.state = None
+        self.since = 0
+        self.progress = 0
+        self.seeked = False
+        self.settled = False
+        self.timer = QTimer(self)
+        self.timer.setInterval(500)
+        self.timer.timeout.connect(monitor.wrap(self.poll))
+        self.playback.updated.connect(self.playbackUpdated)
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.jobs = data.get('jobs', [])
+        for job in self.jobs:
+            if job['status'] == 'running':
+                job['status'] = 'queued'
+        if data.get('active') and self.pending():
+            logging.info('Resuming render queue with %d jobs left', len(self.pending()))
+            self.start()
+
+    def save(self):
+        content = json.dumps({'active': self.active, 'jobs': self.jobs}, indent=4)
+        try:
+            with open(self.path + '.tmp', 'w') as f:
+                f.write(content)
+            os.replace(self.path + '.tmp', self.path)
+        except OSError as exception:
+            logging.error('Failed to save render queue: {} {}'.format(self.path, exception))
+        self.changed.emit()
+
+    def add(self, name, codec, fps, lossless, output, startTime=None, endTime=None):
+        self.jobs.append({
+            'id': max([job['id'] for job in self.jobs] + [0]) + 1,
+            'sequence': name,
+            'directory': self.sequence.directory,
+            'codec': codec,
+            'fps': fps,
+            'lossless': lossless,
+            'startTime': startTime,
+            'endTime': endTime,
+            'output': output,
+            'status': 'queued',
+            'attempts': 0,
+            'durations': [],
+            'error': None,
+        })
+        self.save()
+
+    def remove(self, id):
+        self.jobs = [job for job in self.jobs if job['id'] != id or job is self.job]
+        self.save()
+
+    def clearFinished(self):
+        self.jobs = [job for job in self.jobs if job['status'] not in ('done', 'failed')]
+        self.save()
+
+    def retryFailed(self):
+        for job in self.jobs:
+            if job['status'] == 'failed':
+                job.update(status='queued', attempts=0, error=None)
+        self.save()
+
+    def pending(self):
+        return [job for job in self.jobs if job['status'] == 'queued']
+
+    def start(self):
+        if not self.active:
+            self.active = True
+            self.state = 'waiting'
+            self.timer.start()
+            self.save()
+
+    def stop(self):
+        if self.active:
+            self.active = False
+            self.timer.stop()
+            if self.job is not None:
+                self.job['status'] = 'queued'
+                self.job = None
+                if self.recording.recording:
+                    self.recording.update({'recording': False})
+            self.state = None
+            self.save()
+
+    def poll(self):
+        now = time.time()
+        if self.job is not None and not self.game.connected:
+            self.fail('Game disconnected')
+        elif self.state == 'waiting':
+            if self.game.connected and not self.recording.recording:
+                self.next()
+        elif self.state == 'seeking':
+            if self.settled:
+                self.record()
+            elif now - self.since > RENDER_START_TIMEOUT:
+                self.fail('Seek did not finish')
+        elif self.state == 'starting':
+            if self.recording.recording:
+                self.state = 'recording'
+                self.since = now
+            elif now - self.since > RENDER_START_TIMEOUT:
+                self.fail('Recording did not start')
+        elif self.state == 'recording':
+            if not self.recording.recording:
+                if self.recording.currentTime >= self.job['range'][1] - 0.5:
+                    self.finish()
+                else:
+                    self.fail('Recording stopped at {:.2f}'.format(self.recording.currentTime))
+            elif self.recording.currentTime != self.progress:
+                self.progress = self.recording.currentTime
+                self.since = now
+            elif now - self.since > RENDER_STALL_TIMEOUT:
+                self.recording.update({'recording': False})
+                self.fail('Recording stalled at {:.2f}'.format(self.progress))
+
+    def playbackUpdated(self):
+        # Only polls after the seek request has gone out count, the game
+        # reports seeking while it moves and then idles at the start time
+        if self.state != 'seeking' or self.playback.inflight or self.playback.target is not None:
+            return
+        if self.playback.seeking:
+            self.seeked = True
+        elif self.seeked or abs(self.playback.time - self.job['range'][0]) <= 1.0 / max(self.job['fps'], 1):
+            self.settled = True
+
+    def next(self):
+        pending = self.pending()
+        if not pending:
+            self.active = False
+            self.timer.stop()
+            self.state = None
+            done = [job for job in self.jobs if job['status'] == 'done']
+            logging.info('Render queue finished, %d done, %d failed, %.1fs recording', len(done),
+                len(self.jobs) - len(done), sum(job['durations'][-1] for job in done))
+            self.save()
+            return
+        job = self.job = pending[0]
+        job['status'] = 'running'
+        job['attempts'] += 1
+        job['started'] = time.time()
+        path = os.path.join(job['directory'] or '', job['sequence'] + '.json')
+        if not os.path.isfile(path):
+            return self.fail('Missing sequence {}'.format(path), retry=False)
+        if self.sequence.directory != job['directory']:
+            self.sequence.setDirectory(job['directory'])
+        self.sequence.load(job['sequence'])
+        self.sequence.setSequencing(True)
+        startTime = job['startTime'] if job['startTime'] is not None else self.sequence.startTime
+        endTime = job['endTime'] if job['endTime'] is not None else self.sequence.endTime
+        if startTime is None or endTime is None or endTime <= startTime:
+            return self.fail('Sequence {} has no camera keyframes'.format(job['sequence']), retry=False)
+        job['range'] = [startTime, endTime]
+        logging.info('Render queue job %d: %s %.2f-%.2f, attempt %d', job['id'], job['sequence'], startTime, endTime, job['attempts'])
+        self.sequence.saveRemoteNow()
+        self.playback.pause(startTime)
+        self.state = 'seeking'
+        self.seeked = False
+        self.settled = False
+        self.since = time.time()
+        self.save()
+
+    def record(self):
+        job = self.job
+        self.playback.play()
+        self.recording.update({
+            'recording' : True,
+            'codec' : job['codec'],
+            'startTime' : job['range'][0],
+            'endTime' : job['range'][1],
+            'framesPerSecond' : job['fps'],
+            'enforceFrameRate' : True,
+            'lossless' : job['lossless'],
+            'path' : job['output'],
+        })
+        self.state = 'starting'
+        self.since = time.time()
+        self.progress = 0
+
+    def finish(self):
+        job = self.job
+        duration = time.time() - job['started']
+        job['durations'].append(duration)
+        job['status'] = 'done'
+        job['error'] = None
+        logging.info('Rendered %s in %.1fs (%.2fx realtime) after %d attempts', job['sequence'], duration,
+            (job['range'][1] - job['range'][0]) / max(duration, 0.001), job['attempts'])
+        self.job = None
+        self.state = 'waiting'
+        self.save()
+
+    def fail(self, error, retry=True):
+        job = self.job
+        job['durations'].append(time.time() - job['started'])
+        job['error'] = error
+        if retry and job['attempts'] < RENDER_ATTEMPTS:
+            job['status'] = 'queued'
+            logging.warning('Render queue job %d failed, retrying: %s', job['id'], error)
+        else:
+            job['status'] = 'failed'
+            logging.error('Render queue job {} failed: {}'.format(job['id'], error))
+        self.job = None
+        self.state = 'waiting'
+        self.save()
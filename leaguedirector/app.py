@@ -1,9 +1,14 @@
 import os
 import sys
 import json
+import time
+import psutil
+import copy
 import functools
 import logging
 import logging.handlers
+import platform
+import threading
 import leaguedirector
 from PySide6.QtGui import *
 from PySide6.QtCore import *
@@ -12,10 +17,16 @@ from PySide6.QtNetwork import *
 from leaguedirector.widgets import *
 from leaguedirector.sequencer import *
 from leaguedirector.enable import *
-from leaguedirector.api import Game, Playback, Render, Particles, Recording, Sequence
+from leaguedirector.bake import bakeFile, FORMATS
+from leaguedirector.api import Game, Playback, Render, Particles, Recording, Sequence, CameraMotion, RenderQueue
 from leaguedirector.bindings import Bindings
 from leaguedirector.settings import Settings
+from leaguedirector.logs import setupQueue, LOG_SIZE, LOG_BACKUPS
+from leaguedirector.monitor import monitor, profiler, SLOW_HANDLER
 
+# Writes per second sent to the game while an input is being dragged or spun
+LIVE_RATE = 10
+CAMERA_RATE = 30
 
 class SkyboxCombo(QComboBox):
     def showPopup(self):
@@ -108,10 +119,8 @@ class VisibleWindow(QScrollArea):
     def __init__(self, api):
         QScrollArea.__init__(self)
         self.api = api
-        self.api.render.updated.connect(self.update)
         self.api.connected.connect(self.connect)
         self.inputs = {}
-        self.bindings = {}
         self.setWidgetResizable(True)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setWindowTitle('Visibility')
@@ -119,9 +128,7 @@ class VisibleWindow(QScrollArea):
         layout = QFormLayout()
         for name, binding, label in self.options:
             self.inputs[name] = BooleanInput()
-            self.inputs[name].setValue(True)
-            self.inputs[name].valueChanged.connect(functools.partial(self.api.render.set, name))
-            self.bindings[binding] = name
+            FieldBinding(self.inputs[name], self.api.render, name)
             layout.addRow(label, self.inputs[name])
         widget.setLayout(layout)
         self.setWidget(widget)
@@ -130,10 +137,6 @@ class VisibleWindow(QScrollArea):
         for name, field in self.inputs.items():
             self.api.render.set(name, field.value())
 
-    def update(self):
-        for name, field in self.inputs.items():
-            field.setValue(self.api.render.get(name))
-
     def restoreSettings(self, data):
         for name, value in data.items():
             if name in self.inputs:
@@ -143,9 +146,8 @@ class VisibleWindow(QScrollArea):
     def saveSettings(self):
         return {name:self.api.render.get(name) for name in self.inputs}
 
-    def onKeybinding(self, name):
-        if name in self.bindings:
-            self.inputs[self.bindings[name]].toggle()
+    def keybindings(self):
+        return {binding : self.inputs[name].toggle for name, binding, _ in self.options}
 
 
 class RenderWindow(QScrollArea):
@@ -168,6 +170,16 @@ class RenderWindow(QScrollArea):
         self.cameraMoveSpeed.setRelativeStep(0.1)
         self.cameraLookSpeed = FloatInput(0.01, 5)
         self.cameraLookSpeed.setSingleStep(0.01)
+        self.keyMoveSpeed = FloatInput(0, 100000)
+        self.keyLookSpeed = FloatInput(0, 3600)
+        self.keyZoomSpeed = FloatInput(0, 180)
+        for field, input in [
+            ('cameraPosition', self.keyMoveSpeed),
+            ('cameraRotation', self.keyLookSpeed),
+            ('fieldOfView', self.keyZoomSpeed),
+        ]:
+            input.update(self.api.camera.speeds[field])
+            input.valueChanged.connect(functools.partial(self.api.camera.setSpeed, field))
         self.fieldOfView = FloatInput(0, 180)
         self.nearClip = FloatInput()
         self.nearClip.setRelativeStep(0.05)
@@ -209,44 +221,50 @@ class RenderWindow(QScrollArea):
         self.depthOfFieldMid.setRelativeStep(0.05)
         self.depthOfFieldFar = FloatInput(0, 100000)
         self.depthOfFieldFar.setRelativeStep(0.05)
-        self.cameraLockX.valueChanged.connect(functools.partial(self.api.render.set, 'cameraLockX'))
-        self.cameraLockY.valueChanged.connect(functools.partial(self.api.render.set, 'cameraLockY'))
-        self.cameraLockZ.valueChanged.connect(functools.partial(self.api.render.set, 'cameraLockZ'))
         self.cameraMoveBackX.valueChanged.connect(self.api.render.toggleCameraMoveBackX)
         self.cameraMoveBackY.valueChanged.connect(self.api.render.toggleCameraMoveBackY)
         self.cameraMoveBackZ.valueChanged.connect(self.api.render.toggleCameraMoveBackZ)
-        self.cameraPosition.valueChanged.connect(functools.partial(self.api.render.set, 'cameraPosition'))
-        self.cameraRotation.valueChanged.connect(functools.partial(self.api.render.set, 'cameraRotation'))
-        self.cameraAttached.valueChanged.connect(functools.partial(self.api.render.set, 'cameraAttached'))
-        self.cameraMoveSpeed.valueChanged.connect(functools.partial(self.api.render.set, 'cameraMoveSpeed'))
-        self.cameraLookSpeed.valueChanged.connect(functools.partial(self.api.render.set, 'cameraLookSpeed'))
-        self.fieldOfView.valueChanged.connect(functools.partial(self.api.render.set, 'fieldOfView'))
-        self.nearClip.valueChanged.connect(functools.partial(self.api.render.set, 'nearClip'))
-        self.farClip.valueChanged.connect(functools.partial(self.api.render.set, 'farClip'))
-        self.navGrid.valueChanged.connect(functools.partial(self.api.render.set, 'navGridOffset'))
-        self.simulateAllParticlesWhileOffScreen.valueChanged.connect(functools.partial(self.api.render.set, 'simulateAllParticlesWhileOffScreen'))
         self.skyboxes.activated.connect(lambda index: self.api.render.set('skyboxPath', self.skyboxes.itemData(index)))
-        self.skyboxRotation.valueChanged.connect(functools.partial(self.api.render.set, 'skyboxRotation'))
-        self.skyboxRadius.valueChanged.connect(functools.partial(self.api.render.set, 'skyboxRadius'))
-        self.skyboxOffset.valueChanged.connect(functools.partial(self.api.render.set, 'skyboxOffset'))
-        self.sunDirection.valueChanged.connect(functools.partial(self.api.render.set, 'sunDirection'))
-        self.depthFogEnabled.valueChanged.connect(functools.partial(self.api.render.set, 'depthFogEnabled'))
-        self.depthFogStart.valueChanged.connect(functools.partial(self.api.render.set, 'depthFogStart'))
-        self.depthFogEnd.valueChanged.connect(functools.partial(self.api.render.set, 'depthFogEnd'))
-        self.depthFogIntensity.valueChanged.connect(functools.partial(self.api.render.set, 'depthFogIntensity'))
-        self.depthFogColor.valueChanged.connect(functools.partial(self.api.render.set, 'depthFogColor'))
-        self.heightFogEnabled.valueChanged.connect(functools.partial(self.api.render.set, 'heightFogEnabled'))
-        self.heightFogStart.valueChanged.connect(functools.partial(self.api.render.set, 'heightFogStart'))
-        self.heightFogEnd.valueChanged.connect(functools.partial(self.api.render.set, 'heightFogEnd'))
-        self.heightFogIntensity.valueChanged.connect(functools.partial(self.api.render.set, 'heightFogIntensity'))
-        self.heightFogColor.valueChanged.connect(functools.partial(self.api.render.set, 'heightFogColor'))
-        self.depthOfFieldEnabled.valueChanged.connect(functools.partial(self.api.render.set, 'depthOfFieldEnabled'))
-        self.depthOfFieldDebug.valueChanged.connect(functools.partial(self.api.render.set, 'depthOfFieldDebug'))
-        self.depthOfFieldCircle.valueChanged.connect(functools.partial(self.api.render.set, 'depthOfFieldCircle'))
-        self.depthOfFieldWidth.valueChanged.connect(functools.partial(self.api.render.set, 'depthOfFieldWidth'))
-        self.depthOfFieldNear.valueChanged.connect(functools.partial(self.api.render.set, 'depthOfFieldNear'))
-        self.depthOfFieldMid.valueChanged.connect(functools.partial(self.api.render.set, 'depthOfFieldMid'))
-        self.depthOfFieldFar.valueChanged.connect(functools.partial(self.api.render.set, 'depthOfFieldFar'))
+        for name, field in [
+            ('cameraLockX', self.cameraLockX),
+            ('cameraLockY', self.cameraLockY),
+            ('cameraLockZ', self.cameraLockZ),
+            ('cameraPosition', self.cameraPosition),
+            ('cameraRotation', self.cameraRotation),
+            ('cameraAttached', self.cameraAttached),
+            ('cameraMoveSpeed', self.cameraMoveSpeed),
+            ('cameraLookSpeed', self.cameraLookSpeed),
+            ('fieldOfView', self.fieldOfView),
+            ('nearClip', self.nearClip),
+            ('farClip', self.farClip),
+            ('navGridOffset', self.navGrid),
+            ('simulateAllParticlesWhileOffScreen', self.simulateAllParticlesWhileOffScreen),
+            ('skyboxRotation', self.skyboxRotation),
+            ('skyboxRadius', self.skyboxRadius),
+            ('skyboxOffset', self.skyboxOffset),
+            ('sunDirection', self.sunDirection),
+            ('depthFogEnabled', self.depthFogEnabled),
+            ('depthFogStart', self.depthFogStart),
+            ('depthFogEnd', self.depthFogEnd),
+            ('depthFogIntensity', self.depthFogIntensity),
+            ('depthFogColor', self.depthFogColor),
+            ('heightFogEnabled', self.heightFogEnabled),
+            ('heightFogStart', self.heightFogStart),
+            ('heightFogEnd', self.heightFogEnd),
+            ('heightFogIntensity', self.heightFogIntensity),
+            ('heightFogColor', self.heightFogColor),
+            ('depthOfFieldEnabled', self.depthOfFieldEnabled),
+            ('depthOfFieldDebug', self.depthOfFieldDebug),
+            ('depthOfFieldCircle', self.depthOfFieldCircle),
+            ('depthOfFieldWidth', self.depthOfFieldWidth),
+            ('depthOfFieldNear', self.depthOfFieldNear),
+            ('depthOfFieldMid', self.depthOfFieldMid),
+            ('depthOfFieldFar', self.depthOfFieldFar),
+        ]:
+            FieldBinding(field, self.api.render, name)
+            field.setLiveRate(CAMERA_RATE if name.startswith('camera') else LIVE_RATE)
+        self.api.render.field('cameraMode').changed.connect(self.cameraMode.setText)
+        self.api.render.field('skyboxRadius').changed.connect(self.updateSkyboxRange)
 
         widget = QWidget()
         layout = QFormLayout()
@@ -259,6 +277,9 @@ class RenderWindow(QScrollArea):
         layout.addRow('Camera Attached', self.cameraAttached)
         layout.addRow('Camera Move Speed', self.cameraMoveSpeed)
         layout.addRow('Camera Look Speed', self.cameraLookSpeed)
+        layout.addRow('Key Move Speed (units/s)', self.keyMoveSpeed)
+        layout.addRow('Key Look Speed (degrees/s)', self.keyLookSpeed)
+        layout.addRow('Key Zoom Speed (degrees/s)', self.keyZoomSpeed)
         layout.addRow('Field of View', self.fieldOfView)
         layout.addRow('Near Clip', self.nearClip)
         layout.addRow('Far Clip', self.farClip)
@@ -295,51 +316,20 @@ class RenderWindow(QScrollArea):
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setWidget(widget)
         self.setWindowTitle('Rendering')
+        self.moveBack = None
 
     def update(self):
-        self.cameraLockX.update(self.api.render.cameraLockX)
-        self.cameraLockY.update(self.api.render.cameraLockY)
-        self.cameraLockZ.update(self.api.render.cameraLockZ)
-        self.cameraMoveBackX.update(self.api.render.cameraMoveBackX is not None)
-        self.cameraMoveBackY.update(self.api.render.cameraMoveBackY is not None)
-        self.cameraMoveBackZ.update(self.api.render.cameraMoveBackZ is not None)
-        self.cameraMoveBackX.setCheckboxText('{0:.2f}'.format(self.api.render.cameraMoveBackX) if self.api.render.cameraMoveBackX else 'X')
-        self.cameraMoveBackY.setCheckboxText('{0:.2f}'.format(self.api.render.cameraMoveBackY) if self.api.render.cameraMoveBackY else 'Y')
-        self.cameraMoveBackZ.setCheckboxText('{0:.2f}'.format(self.api.render.cameraMoveBackZ) if self.api.render.cameraMoveBackZ else 'Z')
-        self.cameraMode.setText(self.api.render.cameraMode)
-        self.cameraPosition.update(self.api.render.cameraPosition)
-        self.cameraRotation.update(self.api.render.cameraRotation)
-        self.cameraAttached.update(self.api.render.cameraAttached)
-        self.cameraMoveSpeed.update(self.api.render.cameraMoveSpeed)
-        self.cameraLookSpeed.update(self.api.render.cameraLookSpeed)
-        self.fieldOfView.update(self.api.render.fieldOfView)
-        self.nearClip.update(self.api.render.nearClip)
-        self.farClip.update(self.api.render.farClip)
-        self.navGrid.update(self.api.render.navGridOffset)
-        self.simulateAllParticlesWhileOffScreen.update(self.api.render.simulateAllParticlesWhileOffScreen)
-        self.skyboxRotation.update(self.api.render.skyboxRotation)
-        self.skyboxRadius.update(self.api.render.skyboxRadius)
-        self.skyboxOffset.update(self.api.render.skyboxOffset)
-        self.skyboxOffset.setRange(-self.api.render.skyboxRadius, self.api.render.skyboxRadius)
-        self.skyboxOffset.setSingleStep(self.api.render.skyboxRadius / 1000)
-        self.sunDirection.update(self.api.render.sunDirection)
-        self.depthFogEnabled.update(self.api.render.depthFogEnabled)
-        self.depthFogStart.update(self.api.render.depthFogStart)
-        self.depthFogEnd.update(self.api.render.depthFogEnd)
-        self.depthFogIntensity.update(self.api.render.depthFogIntensity)
-        self.depthFogColor.update(self.api.render.depthFogColor)
-        self.heightFogEnabled.update(self.api.render.heightFogEnabled)
-        self.heightFogStart.update(self.api.render.heightFogStart)
-        self.heightFogEnd.update(self.api.render.heightFogEnd)
-        self.heightFogIntensity.update(self.api.render.heightFogIntensity)
-        self.heightFogColor.update(self.api.render.heightFogColor)
-        self.depthOfFieldEnabled.update(self.api.render.depthOfFieldEnabled)
-        self.depthOfFieldDebug.update(self.api.render.depthOfFieldDebug)
-        self.depthOfFieldCircle.update(self.api.render.depthOfFieldCircle)
-        self.depthOfFieldWidth.update(self.api.render.depthOfFieldWidth)
-        self.depthOfFieldNear.update(self.api.render.depthOfFieldNear)
-        self.depthOfFieldMid.update(self.api.render.depthOfFieldMid)
-        self.depthOfFieldFar.update(self.api.render.depthOfFieldFar)
+        render = self.api.render
+        moveBack = (render.cameraMoveBackX, render.cameraMoveBackY, render.cameraMoveBackZ)
+        if moveBack != self.moveBack:
+            self.moveBack = moveBack
+            for field, value, label in zip((self.cameraMoveBackX, self.cameraMoveBackY, self.cameraMoveBackZ), moveBack, 'XYZ'):
+                field.update(value is not None)
+                field.setCheckboxText('{0:.2f}'.format(value) if value else label)
+
+    def updateSkyboxRange(self, radius):
+        self.skyboxOffset.setRange(-radius, radius)
+        self.skyboxOffset.setSingleStep(radius / 1000)
 
 
 class ParticlesWindow(VBoxWidget):
@@ -391,11 +381,70 @@ class ParticlesWindow(VBoxWidget):
         self.search.clear()
 
 
+class PerformanceWindow(VBoxWidget):
+    columns = ['Handler', 'Calls', 'p50 ms', 'p90 ms', 'p99 ms', 'Max ms']
+
+    def __init__(self):
+        VBoxWidget.__init__(self)
+        self.setWindowTitle('Performance')
+        self.threshold = FloatInput(1, 10000)
+        self.threshold.update(monitor.threshold * 1000)
+        self.threshold.valueChanged.connect(monitor.setThreshold)
+        self.table = QTableWidget(0, len(self.columns))
+        self.table.setHorizontalHeaderLabels(self.columns)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        reset = QPushButton('Reset')
+        reset.clicked.connect(monitor.reset)
+        reset.clicked.connect(self.update)
+        export = QPushButton('Export')
+        export.clicked.connect(self.export)
+        form = QWidget()
+        layout = QFormLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addRow('Slow Handler (ms)', self.threshold)
+        form.setLayout(layout)
+        self.addWidget(form)
+        self.addWidget(self.table)
+        self.addWidget(HBoxWidget(reset, export))
+        self.timerUpdate = schedule(1000, self.update)
+
+    def sizeHint(self):
+        return QSize(560, 360)
+
+    def export(self):
+        path = userpath('logs', 'performance-{}.json'.format(time.strftime('%Y%m%d-%H%M%S')))
+        try:
+            monitor.export(path)
+        except OSError as exception:
+            logging.error('Export Failed: {} {}'.format(path, exception))
+
+    def update(self):
+        if not self.isVisible():
+            return
+        rows = monitor.percentiles()
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                text = value if column == 0 else str(value) if column == 1 else '{:.1f}'.format(value)
+                item = self.table.item(row, column)
+                if item is None:
+                    self.table.setItem(row, column, QTableWidgetItem(text))
+                elif item.text() != text:
+                    item.setText(text)
+
+
 class RecordingWindow(VBoxWidget):
     def __init__(self, api):
         VBoxWidget.__init__(self)
         self.api = api
-        self.api.recording.updated.connect(self.update)
+        self.api.recording.field('recording').changed.connect(self.updateRecording)
+        self.api.recording.field('startTime').changed.connect(self.updateProgress)
+        self.api.recording.field('endTime').changed.connect(self.updateProgress)
+        self.api.recording.field('currentTime').changed.connect(self.updateProgress)
+        self.api.recording.field('path').changed.connect(self.updatePath)
+        self.api.playback.field('length').changed.connect(self.updateLength)
         self.recordings = set()
 
         self.codec = QComboBox()
@@ -427,6 +476,20 @@ class RecordingWindow(VBoxWidget):
         self.list.setSortingEnabled(True)
         self.list.itemDoubleClicked.connect(self.openRecording)
 
+        self.api.queue.changed.connect(self.updateQueue)
+        self.queue = QListWidget()
+        self.queueAdd = QPushButton('Queue Sequence')
+        self.queueAdd.clicked.connect(self.queueSequence)
+        self.queueStart = QPushButton('Start Queue')
+        self.queueStart.clicked.connect(self.api.queue.start)
+        self.queueRemove = QPushButton('Remove')
+        self.queueRemove.clicked.connect(self.removeQueued)
+        self.queueRetry = QPushButton('Retry Failed')
+        self.queueRetry.clicked.connect(self.api.queue.retryFailed)
+        self.queueClear = QPushButton('Clear Finished')
+        self.queueClear.clicked.connect(self.api.queue.clearFinished)
+        self.queueLabel = QLabel()
+
         self.form = QWidget(self)
         self.formLayout = QFormLayout(self.form)
         self.formLayout.addRow('Codec', self.codec)
@@ -437,6 +500,10 @@ class RecordingWindow(VBoxWidget):
         self.formLayout.addRow('Output Directory', HBoxWidget(self.outputButton, self.outputLabel))
         self.formLayout.addRow(HBoxWidget(self.button, self.button2))
         self.formLayout.addRow(self.list)
+        self.formLayout.addRow(Separator())
+        self.formLayout.addRow(HBoxWidget(self.queueAdd, self.queueStart))
+        self.formLayout.addRow(self.queue)
+        self.formLayout.addRow(HBoxWidget(self.queueRemove, self.queueRetry, self.queueClear))
         self.form.setLayout(self.formLayout)
 
         self.render = QWidget(self)
@@ -445,6 +512,7 @@ class RecordingWindow(VBoxWidget):
         self.cancel.clicked.connect(self.stopRecording)
         self.renderLayout = QFormLayout()
         self.renderLayout.addRow(QLabel('Rendering video...'))
+        self.renderLayout.addRow(self.queueLabel)
         self.renderLayout.addRow(self.progress)
         self.renderLayout.addRow(self.cancel)
         self.render.setLayout(self.renderLayout)
@@ -452,19 +520,30 @@ class RecordingWindow(VBoxWidget):
         self.addWidget(self.form)
         self.addWidget(self.render)
         self.setWindowTitle('Recording')
+        self.updateLength(self.api.playback.length)
+        self.updateRecording(self.api.recording.recording)
+        self.updateQueue()
 
-    def update(self):
-        self.startTime.setRange(0, self.api.playback.length)
-        self.endTime.setRange(0, self.api.playback.length)
-        self.render.setVisible(self.api.recording.recording)
-        self.form.setVisible(not self.api.recording.recording)
+    def updateLength(self, length):
+        self.startTime.setRange(0, length)
+        self.endTime.setRange(0, length)
+
+    def updateRecording(self, recording):
+        self.render.setVisible(recording)
+        self.form.setVisible(not recording)
+        self.updateProgress()
+        self.updatePath()
+
+    def updateProgress(self, *args):
         if self.api.recording.recording:
-            self.progress.setMinimum(self.api.recording.startTime * 1000)
-            self.progress.setMaximum(self.api.recording.endTime * 1000)
-            self.progress.setValue(self.api.recording.currentTime * 1000)
-            if self.api.recording.path not in self.recordings:
-                self.list.addItem(self.api.recording.path)
-                self.recordings.add(self.api.recording.path)
+            self.progress.setMinimum(int(self.api.recording.startTime * 1000))
+            self.progress.setMaximum(int(self.api.recording.endTime * 1000))
+            self.progress.setValue(int(self.api.recording.currentTime * 1000))
+
+    def updatePath(self, *args):
+        if self.api.recording.recording and self.api.recording.path not in self.recordings:
+            self.list.addItem(self.api.recording.path)
+            self.recordings.add(self.api.recording.path)
 
     def selectOutputDirectory(self):
         self.setOutputDirectory(QFileDialog.getExistingDirectory(self, 'Select Output Directory', self.outputPath))
@@ -473,8 +552,42 @@ class RecordingWindow(VBoxWidget):
         QDesktopServices.openUrl(QUrl('file:///{}'.format(item.text())))
 
     def stopRecording(self):
+        self.api.queue.stop()
         self.api.recording.update({'recording' : False})
 
+    def queueSequence(self):
+        self.api.queue.add(
+            self.api.sequence.name,
+            self.codec.currentText(),
+            self.fps.value(),
+            self.lossless.value(),
+            self.outputPath,
+        )
+
+    def removeQueued(self):
+        for item in self.queue.selectedItems():
+            self.api.queue.remove(item.data(Qt.UserRole))
+
+    def updateQueue(self):
+        self.queue.clear()
+        for job in self.api.queue.jobs:
+            text = '{} [{}] {} {}fps'.format(job['sequence'], job['status'], job['codec'], job['fps'])
+            if job['status'] == 'done':
+                text += ' {:.1f}s'.format(job['durations'][-1])
+            if job['attempts'] > 1 or job['error']:
+                text += ' attempts {}'.format(job['attempts'])
+            item = QListWidgetItem(text)
+            item.setData(Qt.UserRole, job['id'])
+            if job['error']:
+                item.setToolTip(job['error'])
+            self.queue.addItem(item)
+        self.queueStart.setEnabled(not self.api.queue.active and bool(self.api.queue.pending()))
+        job = self.api.queue.job
+        if job is not None:
+            index = self.api.queue.jobs.index(job) + 1
+            self.queueLabel.setText('Queue job {} of {}: {}'.format(index, len(self.api.queue.jobs), job['sequence']))
+        self.queueLabel.setVisible(job is not None)
+
     def startRecording(self):
         self.api.playback.play()
         self.api.recording.update({
@@ -507,14 +620,52 @@ class RecordingWindow(VBoxWidget):
 
 
 class TimelineWindow(QWidget):
+    baked = Signal(str, int, str)
+    bakeFilters = [
+        ('CSV (*.csv)', '.csv'),
+        ('NumPy (*.npy)', '.npy'),
+        ('JSON Lines (*.jsonl)', '.jsonl'),
+    ]
+    keyframeBindings = [
+        ('kf_position', 'cameraPosition'),
+        ('kf_rotation', 'cameraRotation'),
+        ('kf_speed', 'playbackSpeed'),
+        ('kf_fov', 'fieldOfView'),
+        ('kf_near_clip', 'nearClip'),
+        ('kf_far_clip', 'farClip'),
+        ('kf_nav_grid', 'navGridOffset'),
+        ('kf_sky_rotation', 'skyboxRotation'),
+        ('kf_sky_radius', 'skyboxRadius'),
+        ('kf_sky_offset', 'skyboxOffset'),
+        ('kf_sun_direction', 'sunDirection'),
+        ('kf_depth_fog_enable', 'depthFogEnabled'),
+        ('kf_depth_fog_start', 'depthFogStart'),
+        ('kf_depth_fog_end', 'depthFogEnd'),
+        ('kf_depth_fog_intensity', 'depthFogIntensity'),
+        ('kf_depth_fog_color', 'depthFogColor'),
+        ('kf_height_fog_enable', 'heightFogEnabled'),
+        ('kf_height_fog_start', 'heightFogStart'),
+        ('kf_height_fog_end', 'heightFogEnd'),
+        ('kf_height_fog_intensity', 'heightFogIntensity'),
+        ('kf_height_fog_color', 'heightFogColor'),
+        ('kf_dof_enabled', 'depthOfFieldEnabled'),
+        ('kf_dof_circle', 'depthOfFieldCircle'),
+        ('kf_dof_width', 'depthOfFieldWidth'),
+        ('kf_dof_near', 'depthOfFieldNear'),
+        ('kf_dof_mid', 'depthOfFieldMid'),
+        ('kf_dof_far', 'depthOfFieldFar'),
+    ]
+
     def __init__(self, api):
         QWidget.__init__(self)
         self.api = api
         self.api.playback.updated.connect(self.update)
         self.api.sequence.updated.connect(self.update)
-        self.timer = schedule(10, self.animate)
+        self.baked.connect(self.bakeFinished)
+        self.clock = AnimationClock()
+        self.clock.tick.connect(self.animate)
         self.sequenceHeaders = SequenceHeaderView(self.api)
-        self.sequenceTracks = SequenceTrackView(self.api, self.sequenceHeaders)
+        self.sequenceTracks = SequenceTrackView(self.api, self.sequenceHeaders, self.clock)
         layout = QVBoxLayout()
         self.layoutSpeed(layout)
         self.layoutTimeButtons(layout)
@@ -557,6 +708,10 @@ class TimelineWindow(QWidget):
         newSequence.setMaximumWidth(150)
         newSequence.clicked.connect(self.newSequence)
         widget.addWidget(newSequence)
+        bakeSequence = QPushButton('Bake Sequence')
+        bakeSequence.setMaximumWidth(150)
+        bakeSequence.clicked.connect(self.bakeSequence)
+        widget.addWidget(bakeSequence)
         layout.addWidget(widget)
 
         widget = HBoxWidget()
@@ -564,6 +719,18 @@ class TimelineWindow(QWidget):
         widget.addWidget(self.sequenceTracks)
         layout.addWidget(widget)
 
+        self.sequenceCurves = SequenceCurveView(self.api, self.sequenceTracks)
+        self.curveTrack = QComboBox()
+        self.curveTrack.setFixedWidth(162)
+        for name in self.api.sequence.keys():
+            self.curveTrack.addItem(self.api.sequence.getLabel(name), name)
+        self.curveTrack.setCurrentIndex(self.curveTrack.findData(self.sequenceCurves.name))
+        self.curveTrack.activated.connect(lambda index: self.sequenceCurves.setTrack(self.curveTrack.itemData(index)))
+        self.sequenceCurves.trackChanged.connect(lambda name: self.curveTrack.setCurrentIndex(self.curveTrack.findData(name)))
+        curveHeader = VBoxWidget(self.curveTrack)
+        curveHeader.layout.addStretch()
+        layout.addWidget(HBoxWidget(curveHeader, self.sequenceCurves))
+
         sequenceSelection = SequenceSelectedView(self.api, self.sequenceTracks)
         layout.addWidget(sequenceSelection)
 
@@ -575,6 +742,7 @@ class TimelineWindow(QWidget):
         self.speed = FloatSlider('Speed')
         self.speed.setRange(0, 8.0)
         self.speed.setSingleStep(0.1)
+        self.speed.setLiveRate(LIVE_RATE)
         self.speed.valueChanged.connect(lambda: self.api.playback.setSpeed(self.speed.value()))
         widget.addWidget(self.speed)
         for speed in [0.5, 1, 2, 4]:
@@ -601,13 +769,19 @@ class TimelineWindow(QWidget):
         self.timeSlider.setTickPosition(QSlider.TicksBelow)
         self.timeSlider.setTickInterval(60000)
         self.timeSlider.setTracking(False)
+        self.timeSlider.sliderMoved.connect(self.onScrub)
         self.timeSlider.sliderReleased.connect(self.onTimeline)
+        self.timeSlider.sliderPressed.connect(self.updateClock)
+        self.timeSlider.sliderReleased.connect(self.updateClock)
         widget.addWidget(self.timeLabel)
         widget.addWidget(self.timeSlider)
         layout.addWidget(widget)
 
+    def onScrub(self, position):
+        self.api.playback.scrub(position / 1000)
+
     def onTimeline(self):
-        self.api.playback.time = self.timeSlider.sliderPosition() / 1000
+        self.api.playback.seek(self.timeSlider.sliderPosition() / 1000)
 
     def newSequence(self):
         name, ok = QInputDialog.getText(self, 'Create New Sequence', 'Enter a name for your sequence')
@@ -619,106 +793,94 @@ class TimelineWindow(QWidget):
         if ok:
             self.api.sequence.copy(name)
 
+    def bakeSequence(self):
+        fps, ok = QInputDialog.getDouble(self, 'Bake Sequence', 'Frames per second', 60, 1, 1000, 2)
+        if not ok:
+            return
+        directory = os.path.join(self.api.sequence.directory or userpath('sequences'), self.api.sequence.name + '.csv')
+        filters = ';;'.join(name for name, _ in self.bakeFilters)
+        path, selected = QFileDialog.getSaveFileName(self, 'Bake Sequence', directory, filters)
+        if path:
+            extension = os.path.splitext(path)[1]
+            format = FORMATS.get(extension.lower())
+            if format is None:
+                chosen = dict(self.bakeFilters).get(selected, '.csv')
+                format = FORMATS[chosen]
+                if not extension:
+                    path += chosen
+            data = copy.deepcopy(self.api.sequence.data())
+            def bake():
+                try:
+                    self.baked.emit(path, bakeFile(data, path, fps, format=format), '')
+                except Exception as exception:
+                    logging.error('Bake Failed: {} {}'.format(path, exception))
+                    self.baked.emit(path, 0, str(exception))
+            threading.Thread(target=bake).start()
+
+    def bakeFinished(self, path, count, error):
+        if error:
+            QMessageBox.warning(self, 'Bake Sequence', 'Failed to bake {}\n{}'.format(path, error))
+        else:
+            QMessageBox.information(self, 'Bake Sequence', 'Baked {} frames to {}'.format(count, path))
+
     def playSequence(self):
         self.api.sequence.setSequencing(True)
         self.api.playback.play(self.api.sequence.startTime)
 
-    def onKeybinding(self, name):
-        if name == 'sequence_del_kf':
-            self.sequenceTracks.deleteSelectedKeyframes()
-        elif name == 'sequence_next_kf':
-            self.sequenceTracks.selectNextKeyframe()
-        elif name == 'sequence_prev_kf':
-            self.sequenceTracks.selectPrevKeyframe()
-        elif name == 'sequence_adj_kf':
-            self.sequenceTracks.selectAdjacentKeyframes()
-        elif name == 'sequence_all_kf':
-            self.sequenceTracks.selectAllKeyframes()
-        elif name == 'sequence_seek_kf':
-            self.sequenceTracks.seekSelectedKeyframe()
-        elif name == 'sequence_apply':
-            self.applySequence.toggle()
-        elif name == 'sequence_play':
-            self.playSequence()
-        elif name == 'sequence_new':
-            self.newSequence()
-        elif name == 'sequence_copy':
-            self.copySequence()
-        elif name == 'sequence_clear':
-            self.sequenceTracks.clearKeyframes()
-        elif name == 'sequence_undo':
-            self.api.sequence.undo()
-        elif name == 'sequence_redo':
-            self.api.sequence.redo()
-        elif name == 'kf_position':
-            self.sequenceTracks.addKeyframe('cameraPosition')
-        elif name == 'kf_rotation':
-            self.sequenceTracks.addKeyframe('cameraRotation')
-        elif name == 'kf_speed':
-            self.sequenceTracks.addKeyframe('playbackSpeed')
-        elif name == 'kf_fov':
-            self.sequenceTracks.addKeyframe('fieldOfView')
-        elif name == 'kf_near_clip':
-            self.sequenceTracks.addKeyframe('nearClip')
-        elif name == 'kf_far_clip':
-            self.sequenceTracks.addKeyframe('farClip')
-        elif name == 'kf_nav_grid':
-            self.sequenceTracks.addKeyframe('navGridOffset')
-        elif name == 'kf_sky_rotation':
-            self.sequenceTracks.addKeyframe('skyboxRotation')
-        elif name == 'kf_sky_radius':
-            self.sequenceTracks.addKeyframe('skyboxRadius')
-        elif name == 'kf_sky_offset':
-            self.sequenceTracks.addKeyframe('skyboxOffset')
-        elif name == 'kf_sun_direction':
-            self.sequenceTracks.addKeyframe('sunDirection')
-        elif name == 'kf_depth_fog_enable':
-            self.sequenceTracks.addKeyframe('depthFogEnabled')
-        elif name == 'kf_depth_fog_start':
-            self.sequenceTracks.addKeyframe('depthFogStart')
-        elif name == 'kf_depth_fog_end':
-            self.sequenceTracks.addKeyframe('depthFogEnd')
-        elif name == 'kf_depth_fog_intensity':
-            self.sequenceTracks.addKeyframe('depthFogIntensity')
-        elif name == 'kf_depth_fog_color':
-            self.sequenceTracks.addKeyframe('depthFogColor')
-        elif name == 'kf_height_fog_enable':
-            self.sequenceTracks.addKeyframe('heightFogEnabled')
-        elif name == 'kf_height_fog_start':
-            self.sequenceTracks.addKeyframe('heightFogStart')
-        elif name == 'kf_height_fog_end':
-            self.sequenceTracks.addKeyframe('heightFogEnd')
-        elif name == 'kf_height_fog_intensity':
-            self.sequenceTracks.addKeyframe('heightFogIntensity')
-        elif name == 'kf_height_fog_color':
-            self.sequenceTracks.addKeyframe('heightFogColor')
-        elif name == 'kf_dof_enabled':
-            self.sequenceTracks.addKeyframe('depthOfFieldEnabled')
-        elif name == 'kf_dof_circle':
-            self.sequenceTracks.addKeyframe('depthOfFieldCircle')
-        elif name == 'kf_dof_width':
-            self.sequenceTracks.addKeyframe('depthOfFieldWidth')
-        elif name == 'kf_dof_near':
-            self.sequenceTracks.addKeyframe('depthOfFieldNear')
-        elif name == 'kf_dof_mid':
-            self.sequenceTracks.addKeyframe('depthOfFieldMid')
-        elif name == 'kf_dof_far':
-            self.sequenceTracks.addKeyframe('depthOfFieldFar')
+    def keybindings(self):
+        handlers = {
+            'sequence_del_kf': self.sequenceTracks.deleteSelectedKeyframes,
+            'sequence_next_kf': self.sequenceTracks.selectNextKeyframe,
+            'sequence_prev_kf': self.sequenceTracks.selectPrevKeyframe,
+            'sequence_adj_kf': self.sequenceTracks.selectAdjacentKeyframes,
+            'sequence_all_kf': self.sequenceTracks.selectAllKeyframes,
+            'sequence_seek_kf': self.sequenceTracks.seekSelectedKeyframe,
+            'sequence_apply': self.applySequence.toggle,
+            'sequence_play': self.playSequence,
+            'sequence_new': self.newSequence,
+            'sequence_copy': self.copySequence,
+            'sequence_clear': self.sequenceTracks.clearKeyframes,
+            'sequence_undo': self.api.sequence.undo,
+            'sequence_redo': self.api.sequence.redo,
+        }
+        for binding, name in self.keyframeBindings:
+            handlers[binding] = functools.partial(self.sequenceTracks.addKeyframe, name)
+        return handlers
 
     def formatTime(self, t):
         minutes, seconds = divmod(t, 60)
         return '{0:02}:{1:05.2f}'.format(int(minutes), seconds)
 
     def animate(self):
-        self.speed.update(self.api.playback.speed)
-        self.timeSlider.setRange(0, self.api.playback.length * 1000)
         if self.timeSlider.isSliderDown():
-            self.timeLabel.setText(self.formatTime(self.timeSlider.sliderPosition() / 1000))
+            text = self.formatTime(self.timeSlider.sliderPosition() / 1000)
         else:
-            self.timeLabel.setText(self.formatTime(self.api.playback.currentTime))
-            self.timeSlider.setValue(self.api.playback.currentTime * 1000)
+            text = self.formatTime(self.api.playback.currentTime)
+            value = int(self.api.playback.currentTime * 1000)
+            if self.timeSlider.value() != value:
+                self.timeSlider.setValue(value)
+        if self.timeLabel.text() != text:
+            self.timeLabel.setText(text)
+
+    def updateClock(self):
+        visible = self.isVisible()
+        playing = not self.api.playback.paused and self.api.game.connected
+        self.clock.setActive('playback', visible and (playing or self.api.playback.seeking))
+        self.clock.setActive('scrub', visible and self.timeSlider.isSliderDown())
+
+    def showEvent(self, event):
+        QWidget.showEvent(self, event)
+        self.updateClock()
+
+    def hideEvent(self, event):
+        QWidget.hideEvent(self, event)
+        self.updateClock()
 
     def update(self):
+        self.speed.update(self.api.playback.speed)
+        self.timeSlider.setRange(0, int(self.api.playback.length * 1000))
+        self.animate()
+        self.updateClock()
         self.applySequence.update(self.api.sequence.sequencing)
         if self.api.playback.seeking:
             self.play.setDisabled(True)
@@ -743,6 +905,8 @@ class Api(QObject):
         self.playback = Playback()
         self.recording = Recording()
         self.sequence = Sequence(self.render, self.playback)
+        self.camera = CameraMotion(self.render)
+        self.queue = RenderQueue(self.game, self.playback, self.recording, self.sequence)
         self.game.updated.connect(self.updated)
         self.render.updated.connect(self.updated)
         self.particles.updated.connect(self.updated)
@@ -761,83 +925,39 @@ class Api(QObject):
         self.playback.update()
         self.recording.update()
 
-    def onKeybinding(self, name):
-        if name == 'camera_up':
-            self.render.moveCamera(y=7)
-        elif name == 'camera_down':
-            self.render.moveCamera(y=-7)
-        elif name == 'camera_move_speed_up':
-            self.render.cameraMoveSpeed = self.render.cameraMoveSpeed * 1.2
-        elif name == 'camera_move_speed_down':
-            self.render.cameraMoveSpeed = self.render.cameraMoveSpeed * 0.8
-        elif name == 'camera_look_speed_up':
-            self.render.cameraLookSpeed = self.render.cameraLookSpeed * 1.1
-        elif name == 'camera_look_speed_down':
-            self.render.cameraLookSpeed = self.render.cameraLookSpeed * 0.9
-        elif name == 'camera_yaw_left':
-            self.render.rotateCamera(x=-1)
-        elif name == 'camera_yaw_right':
-            self.render.rotateCamera(x=1)
-        elif name == 'camera_pitch_up':
-            self.render.rotateCamera(y=-1)
-        elif name == 'camera_pitch_down':
-            self.render.rotateCamera(y=1)
-        elif name == 'camera_roll_left':
-            self.render.rotateCamera(z=1)
-        elif name == 'camera_roll_right':
-            self.render.rotateCamera(z=-1)
-        elif name == 'camera_move_back_x':
-            self.render.toggleCameraMoveBackX()
-        elif name == 'camera_move_back_y':
-            self.render.toggleCameraMoveBackY()
-        elif name == 'camera_move_back_z':
-            self.render.toggleCameraMoveBackZ()
-        elif name == 'camera_lock_x':
-            self.render.cameraLockX = not self.render.cameraLockX
-        elif name == 'camera_lock_y':
-            self.render.cameraLockY = not self.render.cameraLockY
-        elif name == 'camera_lock_z':
-            self.render.cameraLockZ = not self.render.cameraLockZ
-        elif name == 'camera_attach':
-            self.render.cameraAttached = not self.render.cameraAttached
-        elif name == 'camera_fov_up':
-            self.render.fieldOfView = self.render.fieldOfView * 1.05
-        elif name == 'camera_fov_down':
-            self.render.fieldOfView = self.render.fieldOfView * 0.95
-        elif name == 'render_dof_near_up':
-            self.render.depthOfFieldNear = self.render.depthOfFieldNear * 1.05
-        elif name == 'render_dof_near_down':
-            self.render.depthOfFieldNear = self.render.depthOfFieldNear * 0.95
-        elif name == 'render_dof_mid_up':
-            self.render.depthOfFieldMid = self.render.depthOfFieldMid * 1.05
-        elif name == 'render_dof_mid_down':
-            self.render.depthOfFieldMid = self.render.depthOfFieldMid * 0.95
-        elif name == 'render_dof_far_up':
-            self.render.depthOfFieldFar = self.render.depthOfFieldFar * 1.05
-        elif name == 'render_dof_far_down':
-            self.render.depthOfFieldFar = self.render.depthOfFieldFar * 0.95
-        elif name == 'play_pause':
-            self.playback.paused = not self.playback.paused
-        elif name == 'time_minus_120':
-            self.playback.adjustTime(-120)
-        elif name == 'time_minus_60':
-            self.playback.adjustTime(-60)
-        elif name == 'time_minus_30':
-            self.playback.adjustTime(-30)
-        elif name == 'time_minus_10':
-            self.playback.adjustTime(-10)
-        elif name == 'time_minus_5':
-            self.playback.adjustTime(-5)
-        elif name == 'time_plus_5':
-            self.playback.adjustTime(5)
-        elif name == 'time_plus_10':
-            self.playback.adjustTime(10)
-        elif name == 'time_plus_30':
-            self.playback.adjustTime(30)
-        elif name == 'time_plus_60':
-            self.playback.adjustTime(60)
-        elif name == 'time_plus_120':
-            self.playback.adjustTime(120)
+    def keybindings(self):
+        render = self.render
+        handlers = {
+            'camera_move_speed_up': functools.partial(self.scale, render, 'cameraMoveSpeed', 1.2),
+            'camera_move_speed_down': functools.partial(self.scale, render, 'cameraMoveSpeed', 0.8),
+            'camera_look_speed_up': functools.partial(self.scale, render, 'cameraLookSpeed', 1.1),
+            'camera_look_speed_down': functools.partial(self.scale, render, 'cameraLookSpeed', 0.9),
+            'camera_move_back_x': render.toggleCameraMoveBackX,
+            'camera_move_back_y': render.toggleCameraMoveBackY,
+            'camera_move_back_z': render.toggleCameraMoveBackZ,
+            'camera_lock_x': functools.partial(self.toggle, render, 'cameraLockX'),
+            'camera_lock_y': functools.partial(self.toggle, render, 'cameraLockY'),
+            'camera_lock_z': functools.partial(self.toggle, render, 'cameraLockZ'),
+            'camera_attach': functools.partial(self.toggle, render, 'cameraAttached'),
+            'render_dof_near_up': functools.partial(self.scale, render, 'depthOfFieldNear', 1.05),
+            'render_dof_near_down': functools.partial(self.scale, render, 'depthOfFieldNear', 0.95),
+            'render_dof_mid_up': functools.partial(self.scale, render, 'depthOfFieldMid', 1.05),
+            'render_dof_mid_down': functools.partial(self.scale, render, 'depthOfFieldMid', 0.95),
+            'render_dof_far_up': functools.partial(self.scale, render, 'depthOfFieldFar', 1.05),
+            'render_dof_far_down': functools.partial(self.scale, render, 'depthOfFieldFar', 0.95),
+            'play_pause': self.playback.togglePlay,
+        }
+        for delta in [120, 60, 30, 10, 5]:
+            handlers['time_minus_{}'.format(delta)] = functools.partial(self.playback.adjustTime, -delta)
+            handlers['time_plus_{}'.format(delta)] = functools.partial(self.playback.adjustTime, delta)
+        handlers.update(self.camera.keybindings())
+        return handlers
+
+    def scale(self, resource, name, factor):
+        setattr(resource, name, getattr(resource, name) * factor)
+
+    def toggle(self, resource, name):
+        setattr(resource, name, not getattr(resource, name))
 
 
 class ConnectWindow(QDialog):
@@ -860,34 +980,66 @@ class ConnectWindow(QDialog):
         self.layout.addWidget(self.welcome)
         self.list = QListWidget()
         self.list.itemChanged.connect(self.itemChanged)
-        self.list.setSortingEnabled(False)
+        self.list.setSortingEnabled(True)
         self.layout.addWidget(self.list)
-        self.reload()
+        self.items = {}
+        self.discovery = GameDiscovery()
+        self.discovery.found.connect(self.addGame)
+        self.discovery.removed.connect(self.removeGame)
+        if platform.system() == 'Linux':
+            search = QPushButton('Add Search Folder...')
+            search.clicked.connect(self.addSearchRoot)
+            self.layout.addWidget(search)
 
     def sizeHint(self):
         return QSize(400, 100)
 
+    def addSearchRoot(self):
+        path = QFileDialog.getExistingDirectory(self, 'Add Search Folder', os.path.expanduser('~'))
+        if path and path not in searchRoots:
+            searchRoots.append(path)
+            self.discovery.start()
+
+    def restoreSettings(self, data):
+        searchRoots[:] = data.get('roots', [])
+
+    def saveSettings(self):
+        return {'roots': list(searchRoots)}
+
+    def showEvent(self, event):
+        QDialog.showEvent(self, event)
+        self.discovery.start()
+
     def itemChanged(self, item):
         path = item.text()
         checked = item.checkState() == Qt.Checked
-        if checked != isGameEnabled(path):
-            setGameEnabled(path, checked)
-            self.reload()
-
-    def reload(self):
-        self.list.clear()
-        for path in findInstalledGames():
-            enabled = isGameEnabled(path)
+        if checked != self.discovery.isEnabled(path):
+            self.discovery.setEnabled(path, checked)
+            enabled = self.discovery.isEnabled(path)
+            if enabled is not None:
+                self.addGame(path, enabled)
+
+    def addGame(self, path, enabled):
+        item = self.items.get(path)
+        if item is None:
             item = QListWidgetItem(path)
             item.setFlags(Qt.ItemIsUserCheckable | Qt.ItemIsEnabled)
-            item.setCheckState(Qt.Checked if enabled else Qt.Unchecked)
             item.setBackground(QApplication.palette().alternateBase())
             item.setStatusTip('Sup!')
-            font = item.font()
-            font.setPointSize(14)
-            font.setBold(enabled)
-            item.setFont(font)
+            self.items[path] = item
             self.list.addItem(item)
+        self.list.blockSignals(True)
+        item.setCheckState(Qt.Checked if enabled else Qt.Unchecked)
+        font = item.font()
+        font.setPointSize(14)
+        font.setBold(bool(enabled))
+        item.setFont(font)
+        self.list.blockSignals(False)
+
+    def removeGame(self, path):
+        item = self.items.pop(path, None)
+        if item is not None:
+            self.list.takeItem(self.list.row(item))
 
 
 class UpdateWindow(QDialog):
@@ -909,60 +1061,140 @@ class UpdateWindow(QDialog):
         self.layout.addWidget(self.welcome)
 
 
+class LazySubWindow(QMdiSubWindow):
+    """
+    MDI sub window that only constructs its widget the first time it is
+    shown. Settings restored before then are kept and handed to the widget
+    once it exists, and saved back unchanged if it never does. The time
+    each build takes is logged, as it falls outside the startup report.
+    """
+    built = Signal(object)
+
+    def __init__(self, factory, title):
+        QMdiSubWindow.__init__(self)
+        self.factory = factory
+        self.settings = {}
+        self.setWindowTitle(title)
+
+    def created(self):
+        return self.widget() is not None
+
+    def content(self):
+        if self.widget() is None:
+            start = time.perf_counter()
+            widget = self.factory()
+            self.setWidget(widget)
+            self.resize(self.size().expandedTo(self.sizeHint()))
+            if hasattr(widget, 'restoreSettings'):
+                widget.restoreSettings(self.settings)
+            widget.update()
+            self.built.emit(widget)
+            logging.info('Built %s window in %.3fs', self.windowTitle(), time.perf_counter() - start)
+        return self.widget()
+
+    def restoreSettings(self, data):
+        self.settings = data
+        if self.created() and hasattr(self.widget(), 'restoreSettings'):
+            self.widget().restoreSettings(data)
+
+    def saveSettings(self):
+        if self.created() and hasattr(self.widget(), 'saveSettings'):
+            return self.widget().saveSettings()
+        return self.settings
+
+    def showEvent(self, event):
+        self.content()
+        QMdiSubWindow.showEvent(self, event)
+
+
 class LeagueDirector(object):
     def __init__(self):
+        self.timings = [('import', time.time() - psutil.Process().create_time())]
         self.setupLogging()
         self.app = QApplication()
         self.setup()
         sys.exit(self.app.exec())
 
     def setup(self):
-        self.loadTheme()
+        self.timed('theme', self.loadTheme)
         self.window = QMainWindow()
         self.mdi = QMdiArea()
         self.api = Api()
         self.windows = {}
         self.settings = Settings()
         self.bindings = self.setupBindings()
-        self.addWindow(RenderWindow(self.api), 'render')
-        self.addWindow(ParticlesWindow(self.api), 'particles')
-        self.addWindow(VisibleWindow(self.api), 'visible')
-        self.addWindow(TimelineWindow(self.api), 'timeline')
-        self.addWindow(RecordingWindow(self.api), 'recording')
-        self.addWindow(KeybindingsWindow(self.bindings), 'bindings')
-        self.addWindow(ConnectWindow(), 'connect')
-        self.addWindow(UpdateWindow(), 'update')
+        self.timed('dialogs', self.setupWindows)
         self.window.setCentralWidget(self.mdi)
         self.window.setWindowTitle('League Director')
         self.window.setWindowIcon(QIcon(respath('icon.ico')))
         self.window.closeEvent = self.closeEvent
         self.window.show()
-        self.restoreSettings()
+        self.timed('settings', self.restoreSettings)
         self.checkUpdate()
-        self.bindings.triggered.connect(self.api.onKeybinding)
-        self.bindings.triggered.connect(self.windows['timeline'].onKeybinding)
-        self.bindings.triggered.connect(self.windows['visible'].onKeybinding)
+        self.bindings.register(self.api.keybindings())
+        self.bindings.register({
+            'monitor_toggle': self.toggleMonitor,
+            'profiler_toggle': self.toggleProfiler,
+        })
+        self.bindings.released.connect(self.api.camera.release)
         self.timerUpdate = schedule(500, self.update)
         self.timerSave = schedule(5000, self.saveSettings)
         self.update()
+        self.reportStartup()
+
+    def setupWindows(self):
+        # Everything but the connect and update dialogs stays hidden until
+        # the game connects, so those windows are built on first show
+        self.addWindow(lambda: RenderWindow(self.api), 'render', 'Rendering')
+        self.addWindow(lambda: ParticlesWindow(self.api), 'particles', 'Particles')
+        self.addWindow(lambda: VisibleWindow(self.api), 'visible', 'Visibility')
+        self.addWindow(lambda: TimelineWindow(self.api), 'timeline', 'Timeline')
+        self.addWindow(lambda: RecordingWindow(self.api), 'recording', 'Recording')
+        self.addWindow(lambda: KeybindingsWindow(self.bindings), 'bindings', 'Key Bindings')
+        self.addWindow(PerformanceWindow, 'performance', 'Performance')
+        self.addWindow(ConnectWindow, 'connect', 'Ready To Connect').content()
+        self.addWindow(UpdateWindow, 'update', 'Update Available!').content()
+
+    def timed(self, name, callback):
+        start = time.perf_counter()
+        callback()
+        self.timings.append((name, time.perf_counter() - start))
+
+    def reportStartup(self):
+        total = time.time() - psutil.Process().create_time()
+        report = ', '.join('{} {:.3f}s'.format(name, seconds) for name, seconds in self.timings)
+        logging.info('Startup took %.3fs (%s)', total, report)
+
+    def windowBuilt(self, widget):
+        # Windows are built on first show, which can be after the api has
+        # already announced the connection they push their state on
+        if hasattr(widget, 'keybindings'):
+            self.bindings.register(widget.keybindings())
+        if self.api.wasConnected and isinstance(widget, (VisibleWindow, ParticlesWindow)):
+            widget.connect()
+
+    def toggleMonitor(self):
+        monitor.setEnabled(not monitor.enabled)
+        self.update()
+
+    def toggleProfiler(self):
+        profiler.toggle(userpath('logs'))
 
     def closeEvent(self, event):
+        profiler.stop()
         self.saveSettings()
+        self.settings.wait()
         QMainWindow.closeEvent(self.window, event)
 
     def setupLogging(self):
         logger = logging.getLogger()
         formatter = logging.Formatter('%(asctime)s [%(levelname)-8s] %(message)s')
         path = userpath('logs', 'leaguedirector.log')
-        handler = logging.handlers.RotatingFileHandler(path, backupCount=20)
-        try:
-            handler.doRollover()
-        except Exception: pass
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_SIZE, backupCount=LOG_BACKUPS)
         handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        handler = logging.StreamHandler()
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        stream = logging.StreamHandler()
+        stream.setFormatter(formatter)
+        setupQueue(logger, handler, stream)
         logger.setLevel(logging.INFO)
         logging.info('Started League Director (%s)', leaguedirector.__version__)
         logging.info('Using SSL (%s)', QSslSocket.sslLibraryVersionString())
@@ -996,6 +1228,8 @@ class LeagueDirector(object):
     def setupBindings(self):
         return Bindings(self.window, self.settings.value('bindings', {}), [
             ('play_pause',                  'Play / Pause',                     'Space'),
+            ('monitor_toggle',              'Toggle Performance Monitor',       'Ctrl+Shift+M'),
+            ('profiler_toggle',             'Start / Stop Profiler',            'Ctrl+Shift+P'),
             ('camera_up',                   'Camera Up',                        ''),
             ('camera_down',                 'Camera Down',                      ''),
             ('camera_yaw_left',             'Camera Yaw Left',                  ''),
@@ -1100,51 +1334,60 @@ class LeagueDirector(object):
             ('kf_dof_far',                  'Keyframe DOF Far',                 ''),
         ])
 
-    def addWindow(self, widget, name):
-        self.windows[name] = widget
+    def addWindow(self, factory, name, title):
+        window = LazySubWindow(factory, title)
         flags = Qt.Window | Qt.WindowTitleHint | Qt.WindowMinimizeButtonHint | Qt.WindowMaximizeButtonHint
-        self.mdi.addSubWindow(widget, flags)
-        widget.update()
+        self.mdi.addSubWindow(window, flags)
+        window.hide()
+        window.built.connect(self.windowBuilt)
+        self.windows[name] = window
+        return window
 
     def update(self):
         self.api.update()
         self.bindings.setGamePid(self.api.game.processID)
         for name, window in self.windows.items():
             if name == 'update':
-                window.parent().setVisible(self.updateAvailable)
+                window.setVisible(self.updateAvailable)
             elif name == 'connect':
-                window.parent().setVisible(not self.api.game.connected)
+                window.setVisible(not self.api.game.connected)
+            elif name == 'performance':
+                window.setVisible(monitor.enabled)
             else:
-                window.parent().setVisible(self.api.game.connected)
+                window.setVisible(self.api.game.connected)
 
     def loadGeometry(self, widget, data):
         if data and len(data) == 4:
             widget.setGeometry(*data)
 
     def loadState(self, widget, data):
+        # Restoring the active flag would show a hidden sub window and build it
         if data is not None:
-            widget.setWindowState(Qt.WindowStates(data))
+            widget.setWindowState(Qt.WindowStates(data) & ~Qt.WindowActive)
 
     def restoreSettings(self):
         self.loadState(self.window, Qt.WindowState(self.settings.value('window/state') or 0))
         self.loadGeometry(self.window, self.settings.value('window/geo'))
-        for name, widget in self.windows.items():
-            parent = widget.parentWidget()
-            self.loadState(parent, self.settings.value('{}/state'.format(name)))
-            self.loadGeometry(parent, self.settings.value('{}/geo'.format(name)))
-            if hasattr(widget, 'restoreSettings'):
-                widget.restoreSettings(self.settings.value('{}/settings'.format(name), {}) or {})
+        self.api.camera.restoreSettings(self.settings.value('camera', {}) or {})
+        monitor.setThreshold(self.settings.value('monitor/threshold', SLOW_HANDLER))
+        monitor.setEnabled(self.settings.value('monitor/enabled', False))
+        for name, window in self.windows.items():
+            self.loadState(window, self.settings.value('{}/state'.format(name)))
+            self.loadGeometry(window, self.settings.value('{}/geo'.format(name)))
+            window.restoreSettings(self.settings.value('{}/settings'.format(name), {}) or {})
 
     def saveSettings(self):
-        self.settings.setValue('bindings', self.bindings.getBindings())
-        self.settings.setValue('window/state', self.window.windowState().value)
-        self.settings.setValue('window/geo', self.window.geometry().getRect())
-        for name, widget in self.windows.items():
-            parent = widget.parentWidget()
-            self.settings.setValue('{}/state'.format(name), parent.windowState().value)
-            self.settings.setValue('{}/geo'.format(name), parent.geometry().getRect())
-            if hasattr(widget, 'saveSettings'):
-                self.settings.setValue('{}/settings'.format(name), widget.saveSettings())
+        with self.settings.batch():
+            self.settings.setValue('bindings', self.bindings.getBindings())
+            self.settings.setValue('camera', self.api.camera.saveSettings())
+            self.settings.setValue('monitor/enabled', monitor.enabled)
+            self.settings.setValue('monitor/threshold', monitor.threshold * 1000)
+            self.settings.setValue('window/state', self.window.windowState().value)
+            self.settings.setValue('window/geo', self.window.geometry().getRect())
+            for name, window in self.windows.items():
+                self.settings.setValue('{}/state'.format(name), window.windowState().value)
+                self.settings.setValue('{}/geo'.format(name), window.geometry().getRect())
+                self.settings.setValue('{}/settings'.format(name), window.saveSettings())
 
     def loadTheme(self):
         palette = QPalette()
@@ -0,0 +1,415 @@
+import os
+import sys
+import math
+import json
+import array
+import logging
+import argparse
+from bisect import bisect_right
+
+VECTOR = ('x', 'y', 'z')
+COLOR = ('r', 'g', 'b', 'a')
+CHUNK = 4096
+
+
+def linear(p):
+    return p
+
+def snap(p):
+    return 0.0
+
+def smoothStep(p):
+    return p * p * (3 - 2 * p)
+
+def smootherStep(p):
+    return p * p * p * (p * (p * 6 - 15) + 10)
+
+def quadraticEaseIn(p):
+    return p * p
+
+def quadraticEaseOut(p):
+    return -(p * (p - 2))
+
+def quadraticEaseInOut(p):
+    if p < 0.5:
+        return 2 * p * p
+    return (-2 * p * p) + (4 * p) - 1
+
+def cubicEaseIn(p):
+    return p * p * p
+
+def cubicEaseOut(p):
+    f = p - 1
+    return f * f * f + 1
+
+def cubicEaseInOut(p):
+    if p < 0.5:
+        return 4 * p * p * p
+    f = (2 * p) - 2
+    return 0.5 * f * f * f + 1
+
+def quarticEaseIn(p):
+    return p * p * p * p
+
+def quarticEaseOut(p):
+    f = p - 1
+    return f * f * f * (1 - p) + 1
+
+def quarticEaseInOut(p):
+    if p < 0.5:
+        return 8 * p * p * p * p
+    f = p - 1
+    return -8 * f * f * f * f + 1
+
+def quinticEaseIn(p):
+    return p * p * p * p * p
+
+def quinticEaseOut(p):
+    f = p - 1
+    return f * f * f * f * f + 1
+
+def quinticEaseInOut(p):
+    if p < 0.5:
+        return 16 * p * p * p * p * p
+    f = (2 * p) - 2
+    return 0.5 * f * f * f * f * f + 1
+
+def sineEaseIn(p):
+    return math.sin((p - 1) * math.pi / 2) + 1
+
+def sineEaseOut(p):
+    return math.sin(p * math.pi / 2)
+
+def sineEaseInOut(p):
+    return 0.5 * (1 - math.cos(p * math.pi))
+
+def circularEaseIn(p):
+    return 1 - math.sqrt(1 - (p * p))
+
+def circularEaseOut(p):
+    return math.sqrt((2 - p) * p)
+
+def circularEaseInOut(p):
+    if p < 0.5:
+        return 0.5 * (1 - math.sqrt(1 - 4 * (p * p)))
+    return 0.5 * (math.sqrt(-((2 * p) - 3) * ((2 * p) - 1)) + 1)
+
+def exponentialEaseIn(p):
+    return p if p == 0.0 else math.pow(2, 10 * (p - 1))
+
+def exponentialEaseOut(p):
+    return p if p == 1.0 else 1 - math.pow(2, -10 * p)
+
+def exponentialEaseInOut(p):
+    if p == 0.0 or p == 1.0:
+        return p
+    if p < 0.5:
+        return 0.5 * math.pow(2, (20 * p) - 10)
+    return -0.5 * math.pow(2, (-20 * p) + 10) + 1
+
+def elasticEaseIn(p):
+    return math.sin(13 * math.pi / 2 * p) * math.pow(2, 10 * (p - 1))
+
+def elasticEaseOut(p):
+    return math.sin(-13 * math.pi / 2 * (p + 1)) * math.pow(2, -10 * p) + 1
+
+def elasticEaseInOut(p):
+    if p < 0.5:
+        return 0.5 * math.sin(13 * math.pi / 2 * (2 * p)) * math.pow(2, 10 * ((2 * p) - 1))
+    return 0.5 * (math.sin(-13 * math.pi / 2 * ((2 * p - 1) + 1)) * math.pow(2, -10 * (2 * p - 1)) + 2)
+
+def backEaseIn(p):
+    return p * p * p - p * math.sin(p * math.pi)
+
+def backEaseOut(p):
+    f = 1 - p
+    return 1 - (f * f * f - f * math.sin(f * math.pi))
+
+def backEaseInOut(p):
+    if p < 0.5:
+        f = 2 * p
+        return 0.5 * (f * f * f - f * math.sin(f * math.pi))
+    f = 1 - (2 * p - 1)
+    return 0.5 * (1 - (f * f * f - f * math.sin(f * math.pi))) + 0.5
+
+def bounceEaseIn(p):
+    return 1 - bounceEaseOut(1 - p)
+
+def bounceEaseOut(p):
+    if p < 4 / 11.0:
+        return (121 * p * p) / 16.0
+    elif p < 8 / 11.0:
+        return (363 / 40.0 * p * p) - (99 / 10.0 * p) + 17 / 5.0
+    elif p < 9 / 10.0:
+        return (4356 / 361.0 * p * p) - (35442 / 1805.0 * p) + 16061 / 1805.0
+    return (54 / 5.0 * p * p) - (513 / 25.0 * p) + 268 / 25.0
+
+def bounceEaseInOut(p):
+    if p < 0.5:
+        return 0.5 * bounceEaseIn(p * 2)
+    return 0.5 * bounceEaseOut(p * 2 - 1) + 0.5
+
+
+BLENDS = {
+    'linear': linear,
+    'snap': snap,
+    'smoothStep': smoothStep,
+    'smootherStep': smootherStep,
+    'quadraticEaseIn': quadraticEaseIn,
+    'quadraticEaseOut': quadraticEaseOut,
+    'quadraticEaseInOut': quadraticEaseInOut,
+    'cubicEaseIn': cubicEaseIn,
+    'cubicEaseOut': cubicEaseOut,
+    'cubicEaseInOut': cubicEaseInOut,
+    'quarticEaseIn': quarticEaseIn,
+    'quarticEaseOut': quarticEaseOut,
+    'quarticEaseInOut': quarticEaseInOut,
+    'quinticEaseIn': quinticEaseIn,
+    'quinticEaseOut': quinticEaseOut,
+    'quinticEaseInOut': quinticEaseInOut,
+    'sineEaseIn': sineEaseIn,
+    'sineEaseOut': sineEaseOut,
+    'sineEaseInOut': sineEaseInOut,
+    'circularEaseIn': circularEaseIn,
+    'circularEaseOut': circularEaseOut,
+    'circularEaseInOut': circularEaseInOut,
+    'exponentialEaseIn': exponentialEaseIn,
+    'exponentialEaseOut': exponentialEaseOut,
+    'exponentialEaseInOut': exponentialEaseInOut,
+    'elasticEaseIn': elasticEaseIn,
+    'elasticEaseOut': elasticEaseOut,
+    'elasticEaseInOut': elasticEaseInOut,
+    'backEaseIn': backEaseIn,
+    'backEaseOut': backEaseOut,
+    'backEaseInOut': backEaseInOut,
+    'bounceEaseIn': bounceEaseIn,
+    'bounceEaseOut': bounceEaseOut,
+    'bounceEaseInOut': bounceEaseInOut,
+}
+
+
+def valueComponents(value):
+    """
+    Component names of a keyframe value or None for scalar values.
+    """
+    if isinstance(value, dict):
+        return COLOR if 'r' in value else VECTOR
+    return None
+
+
+def flattenValue(value, components):
+    if components is None:
+        return (float(value),)
+    return tuple(float(value.get(key, 0)) for key in components)
+
+
+class BakeTrack(object):
+    """
+    A single sequence track prepared for evaluation. Keyframe values are
+    flattened into tuples of floats and each segment precomputes its delta
+    so sampling is a handful of multiplies per component.
+
+    The blend of a keyframe controls the transition from that keyframe
+    to the next one.
+    """
+
+    def __init__(self, name, keyframes):
+        self.name = name
+        keyframes = sorted(keyframes, key=lambda item: item['time'])
+        first = keyframes[0]['value']
+        self.components = valueComponents(first)
+        self.boolean = isinstance(first, bool)
+        self.times = [float(item['time']) for item in keyframes]
+        self.values = [self.flatten(item['value']) for item in keyframes]
+        self.segments = []
+        for index in range(len(keyframes) - 1):
+            t0, t1 = self.times[index], self.times[index + 1]
+            v0, v1 = self.values[index], self.values[index + 1]
+            blend = BLENDS.get(keyframes[index].get('blend'), linear)
+            if self.boolean:
+                blend = snap
+            scale = 1.0 / (t1 - t0) if t1 > t0 else 0.0
+            delta = tuple(b - a for a, b in zip(v0, v1))
+            self.segments.append((t0, t1, scale, blend, v0, delta))
+        self.index = 0
+
+    def flatten(self, value):
+        return flattenValue(value, self.components)
+
+    def columns(self):
+        if self.components is None:
+            return [self.name]
+        return ['{}.{}'.format(self.name, key) for key in self.components]
+
+    def seek(self, time):
+        self.index = max(bisect_right(self.times, time) - 1, 0)
+
+    def sample(self, times):
+        """
+        Evaluate a monotonically increasing run of times, returning one
+        value tuple per time. The segment cursor only moves forward.
+        """
+        results = []
+        append = results.append
+        segments = self.segments
+        count = len(segments)
+        first, last = self.values[0], self.values[-1]
+        start, end = self.times[0], self.times[-1]
+        index = self.index
+        for time in times:
+            if time <= start:
+                append(first)
+                continue
+            if time >= end:
+                append(last)
+                continue
+            while index < count and segments[index][1] <= time:
+                index += 1
+            t0, t1, scale, blend, v0, delta = segments[index]
+            p = blend((time - t0) * scale)
+            append(tuple(a + d * p for a, d in zip(v0, delta)))
+        self.index = index
+        return results
+
+    def unflatten(self, values):
+        if self.components is None:
+            return bool(values[0]) if self.boolean else values[0]
+        return dict(zip(self.components, values))
+
+
+def bakeTracks(data):
+    return [BakeTrack(name, keyframes) for name, keyframes in sorted(data.items()) if isinstance(keyframes, list) and keyframes]
+
+
+def bakeRange(data):
+    """
+    Matches Sequence.startTime / endTime which are driven by the camera
+    tracks, falling back to every track when there are no camera keyframes.
+    """
+    keyframes = (data.get('cameraPosition') or []) + (data.get('cameraRotation') or [])
+    if not keyframes:
+        keyframes = [item for value in data.values() if isinstance(value, list) for item in value]
+    if keyframes:
+        times = [item['time'] for item in keyframes]
+        return min(times), max(times)
+    return None, None
+
+
+def frameCount(start, end, fps):
+    return int(math.floor((end - start) * fps + 1e-6)) + 1
+
+
+def bakeColumns(tracks):
+    columns = ['time']
+    for track in tracks:
+        columns += track.columns()
+    return columns
+
+
+def bakeFrames(tracks, fps, start, end, chunk=CHUNK):
+    """
+    Generate (time, values) pairs where values holds one tuple per track.
+    Frames are evaluated a chunk at a time so memory stays bounded no
+    matter how long the sequence is.
+    """
+    count = frameCount(start, end, fps)
+    for track in tracks:
+        track.seek(start)
+    for offset in range(0, count, chunk):
+        times = [start + frame / fps for frame in range(offset, min(offset + chunk, count))]
+        samples = [track.sample(times) for track in tracks]
+        for index, time in enumerate(times):
+            yield time, [values[index] for values in samples]
+
+
+def writeCsv(f, tracks, frames):
+    f.write(','.join(bakeColumns(tracks)) + '\n')
+    for time, values in frames:
+        row = [repr(time)]
+        for value in values:
+            row.extend(repr(v) for v in value)
+        f.write(','.join(row) + '\n')
+
+
+def writeJsonLines(f, tracks, frames):
+    for time, values in frames:
+        row = {'time': time}
+        for track, value in zip(tracks, values):
+            row[track.name] = track.unflatten(value)
+        f.write(json.dumps(row) + '\n')
+
+
+def writeNpy(f, tracks, frames, count):
+    """
+    Write a float64 (frames x columns) array in the .npy v1.0 format. The
+    shape is known before sampling starts so rows can be streamed straight
+    after the header without numpy.
+    """
+    columns = len(bakeColumns(tracks))
+    descr = '<f8' if sys.byteorder == 'little' else '>f8'
+    header = "{{'descr': '{}', 'fortran_order': False, 'shape': ({}, {}), }}".format(descr, count, columns)
+    padding = 64 - (10 + len(header) + 1) % 64
+    header = (header + ' ' * padding + '\n').encode('latin1')
+    f.write(b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header)
+    buffer = array.array('d')
+    for time, values in frames:
+        buffer.append(time)
+        for value in values:
+            buffer.extend(value)
+        if len(buffer) >= CHUNK * columns:
+            buffer.tofile(f)
+            del buffer[:]
+    buffer.tofile(f)
+
+
+FORMATS = {
+    '.csv': 'csv',
+    '.npy': 'npy',
+    '.jsonl': 'jsonl',
+}
+
+
+def bakeFile(data, path, fps, start=None, end=None, format=None):
+    """
+    Bake every track of a sequence to a file at a fixed frame rate.
+    Returns the number of frames written.
+    """
+    format = format or FORMATS.get(os.path.splitext(path)[1].lower(), 'csv')
+    defaultStart, defaultEnd = bakeRange(data)
+    start = defaultStart if start is None else start
+    end = defaultEnd if end is None else end
+    if start is None or end is None or end < start or fps <= 0:
+        raise ValueError('Nothing to bake')
+    tracks = bakeTracks(data)
+    count = frameCount(start, end, fps)
+    frames = bakeFrames(tracks, fps, start, end)
+    if format == 'npy':
+        with open(path, 'wb') as f:
+            writeNpy(f, tracks, frames, count)
+    elif format == 'jsonl':
+        with open(path, 'w', newline='\n') as f:
+            writeJsonLines(f, tracks, frames)
+    else:
+        with open(path, 'w', newline='\n') as f:
+            writeCsv(f, tracks, frames)
+    logging.info('Baked %d frames at %s fps to %s', count, fps, path)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bake a League Director sequence to fixed rate samples.')
+    parser.add_argument('sequence', help='Sequence json file')
+    parser.add_argument('output', help='Output file (.csv, .npy or .jsonl)')
+    parser.add_argument('--fps', type=float, default=60.0, help='Samples per second')
+    parser.add_argument('--start', type=float, default=None, help='Start time in seconds')
+    parser.add_argument('--end', type=float, default=None, help='End time in seconds')
+    parser.add_argument('--format', choices=sorted(set(FORMATS.values())), default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)-8s] %(message)s')
+    with open(args.sequence, 'r') as f:
+        data = json.load(f)
+    bakeFile(data, args.output, args.fps, args.start, args.end, args.format)
+
+
+if __name__ == '__main__':
+    main()
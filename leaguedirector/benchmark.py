@@ -0,0 +1,297 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from PySide6 import __version__ as PYSIDE_VERSION
+from PySide6.QtCore import *
+from PySide6.QtWidgets import *
+from leaguedirector.bake import BLENDS
+
+SIZES = (1000, 10000, 50000, 200000)
+
+# Relative share of the keyframes each track gets, camera paths are dense
+# while fog and depth of field are only keyed a few times
+TRACKS = {
+    'cameraPosition': ('vector', 30),
+    'cameraRotation': ('vector', 30),
+    'fieldOfView': ('float', 10),
+    'playbackSpeed': ('float', 4),
+    'nearClip': ('float', 2),
+    'farClip': ('float', 2),
+    'sunDirection': ('vector', 2),
+    'skyboxRotation': ('float', 2),
+    'depthFogEnabled': ('bool', 1),
+    'depthFogStart': ('float', 1),
+    'depthFogEnd': ('float', 1),
+    'depthFogColor': ('color', 1),
+    'heightFogEnabled': ('bool', 1),
+    'heightFogColor': ('color', 1),
+    'depthOfFieldEnabled': ('bool', 1),
+    'depthOfFieldCircle': ('float', 1),
+    'depthOfFieldNear': ('float', 1),
+    'depthOfFieldFar': ('float', 1),
+}
+RANGES = {
+    'fieldOfView': (20, 90),
+    'playbackSpeed': (0.25, 2),
+    'nearClip': (5, 50),
+    'farClip': (5000, 20000),
+    'skyboxRotation': (0, 360),
+    'depthFogStart': (0, 5000),
+    'depthFogEnd': (5000, 15000),
+    'depthOfFieldCircle': (0, 10),
+    'depthOfFieldNear': (0, 2000),
+    'depthOfFieldFar': (2000, 10000),
+}
+
+
+def generateSequence(count, seed=0, duration=None):
+    """
+    Sequence data with count keyframes shared between the tracks by weight.
+    Camera tracks follow a random walk with small gaps between keyframes so
+    the paths look like recorded ones, the other tracks are spread evenly
+    over the same duration. Blend modes are cycled so every one is used
+    once there are at least as many keyframes as modes.
+    """
+    rand = random.Random(seed)
+    total = sum(weight for _, weight in TRACKS.values())
+    duration = duration or max(60.0, count * 0.05)
+    blends = list(BLENDS)
+    data = {}
+    offset = 0
+    for name, (valueType, weight) in TRACKS.items():
+        amount = max(1, count * weight // total)
+        step = duration / amount
+        low, high = RANGES.get(name, (0, 1))
+        position = [rand.uniform(-5000, 5000), rand.uniform(0, 3000), rand.uniform(-5000, 5000)]
+        keyframes = []
+        for index in range(amount):
+            blend = blends[(offset + index) % len(blends)]
+            if valueType == 'vector':
+                position = [axis + rand.gauss(0, 50) for axis in position]
+                value = {'x': position[0], 'y': position[1], 'z': position[2]}
+            elif valueType == 'color':
+                value = {'r': rand.random(), 'g': rand.random(), 'b': rand.random(), 'a': rand.random()}
+            elif valueType == 'bool':
+                value = index % 2 == 0
+            else:
+                value = rand.uniform(low, high)
+            time = round(index * step + rand.uniform(0, step * 0.5), 4)
+            keyframes.append({'time': time, 'value': value, 'blend': blend})
+        data[name] = keyframes
+        offset += amount
+    return data
+
+
+def revision():
+    try:
+        path = os.path.dirname(os.path.abspath(__file__))
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=path, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(results, name, count, function, repeat=1, setup=None, memory=False):
+    """
+    Run function repeat times, letting queued events and timers fire after
+    each run, and record the fastest time in seconds. Setup runs untimed
+    before every run. With memory the peak traced allocation of one extra
+    run is recorded as well, tracing is kept out of the timed runs.
+    """
+    app = QCoreApplication.instance()
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        app.processEvents()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    result = {'name': name, 'keyframes': count, 'seconds': round(best, 6)}
+    if memory:
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        function()
+        app.processEvents()
+        result['peak'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        logging.info('%-24s %8d keyframes %10.4f s %10.1f KiB', name, count, best, result['peak'] / 1024.0)
+    else:
+        logging.info('%-24s %8d keyframes %10.4f s', name, count, best)
+    results.append(result)
+
+
+def benchmarkSequencer(count, repeat=1, seed=0, width=1600, height=600):
+    from leaguedirector.app import Api
+    from leaguedirector.widgets import AnimationClock, VBoxWidget
+    from leaguedirector.sequencer import PRECISION, SequenceHeaderView, SequenceTrackView, SequenceSelectedView
+
+    results = []
+    data = generateSequence(count, seed)
+    length = max(keyframe['time'] for track in data.values() for keyframe in track) + 10
+    api = Api()
+    api.playback.length = length
+    clock = AnimationClock()
+    headers = SequenceHeaderView(api)
+    tracks = SequenceTrackView(api, headers, clock)
+    selection = SequenceSelectedView(api, tracks)
+    window = VBoxWidget(tracks, selection)
+    window.resize(width, height)
+    window.show()
+    QCoreApplication.processEvents()
+
+    def zoom(factor, steps=10):
+        for _ in range(steps):
+            tracks.scale(factor, 1.0)
+            tracks.updateVisible()
+            tracks.viewport().repaint()
+
+    def scroll(steps=50):
+        bar = tracks.horizontalScrollBar()
+        assert bar.maximum() > 0, 'timeline fits in the view, nothing to scroll'
+        for _ in range(steps):
+            bar.setValue(bar.value() + tracks.viewport().width() // 4)
+            QCoreApplication.processEvents()
+
+    def selectFirst():
+        tracks.scene.clearSelection()
+        track = tracks.tracks['cameraPosition']
+        track.keyframeItem(track.sortedKeyframes()[0]).setSelected(True)
+
+    def selectNext(steps=50):
+        for _ in range(steps):
+            tracks.selectNextKeyframe()
+
+    def overlap():
+        for track in tracks.tracks.values():
+            track.updateOverlapNow()
+
+    def drag(steps=20):
+        selected = tracks.selectedKeyframes()
+        anchor = selected[0]
+        position = QPointF(anchor.pos())
+        tracks.beginDrag(anchor, position)
+        for step in range(steps):
+            tracks.moveDrag(position + QPointF(step * 500, 0))
+        tracks.endDrag()
+
+    measure(results, 'load', count, lambda: api.sequence.loadData(data))
+    api.sequence.saveHistoryNow()
+    measure(results, 'repaint', count, tracks.viewport().repaint, repeat)
+    measure(results, 'reload', count, tracks.reload, repeat)
+    measure(results, 'overlap', count, overlap, repeat)
+    measure(results, 'zoom_out', count, lambda: zoom(0.5), 1)
+    measure(results, 'repaint_zoomed_out', count, tracks.viewport().repaint, repeat)
+    measure(results, 'zoom_in', count, lambda: zoom(2.0), 1)
+    # Zoom in until the timeline is many views wide so there is room to scroll
+    widen = 20.0 * tracks.viewport().width() / (length * tracks.transform().m11() * PRECISION)
+    tracks.scale(widen, 1.0)
+    QCoreApplication.processEvents()
+    measure(results, 'scroll', count, scroll, 1)
+    tracks.horizontalScrollBar().setValue(0)
+    tracks.scale(1.0 / widen, 1.0)
+    measure(results, 'select_next', count, lambda: (selectFirst(), selectNext()), repeat)
+    measure(results, 'select_adjacent', count, tracks.selectAdjacentKeyframes, repeat)
+    measure(results, 'drag', count, drag, repeat)
+    api.sequence.saveHistoryNow()
+    measure(results, 'undo', count, api.sequence.undo, 1)
+    measure(results, 'select_all', count, tracks.selectAllKeyframes, 1)
+    measure(results, 'clear_selection', count, tracks.scene.clearSelection, 1)
+    window.close()
+    return [dict(result, suite='sequencer') for result in results]
+
+
+def benchmarkSequence(count, repeat=1, seed=0):
+    from leaguedirector.api import Render, Playback, Sequence
+
+    results = []
+    data = generateSequence(count, seed)
+    sequence = Sequence(Render(), Playback())
+    rand = random.Random(seed)
+
+    def shuffle():
+        for name in TRACKS:
+            rand.shuffle(sequence.getKeyframes(name))
+
+    def history():
+        sequence.resetHistory()
+        for _ in range(3):
+            sequence.saveHistoryNow()
+
+    def times():
+        return sequence.startTime, sequence.endTime
+
+    with tempfile.TemporaryDirectory() as directory:
+        sequence.directory = directory
+        sequence.name = 'benchmark'
+        measure(results, 'loadData', count, lambda: sequence.loadData(data), repeat, memory=True)
+        measure(results, 'sortData', count, sequence.sortData, repeat, shuffle, memory=True)
+        measure(results, 'data', count, sequence.data, repeat, memory=True)
+        measure(results, 'startTime_endTime', count, times, repeat, memory=True)
+        measure(results, 'saveFileNow', count, sequence.saveFileNow, repeat, memory=True)
+        measure(results, 'saveHistoryNow', count, sequence.saveHistoryNow, repeat, sequence.resetHistory, memory=True)
+        measure(results, 'loadHistory', count, lambda: sequence.loadHistory(1), repeat, history, memory=True)
+    return [dict(result, suite='sequence') for result in results]
+
+
+def compare(results, baseline):
+    """
+    Ratio of each result against the matching entry of a previous run.
+    """
+    previous = {(entry.get('suite'), entry['name'], entry['keyframes']): entry['seconds'] for entry in baseline['results']}
+    for entry in results:
+        before = previous.get((entry.get('suite'), entry['name'], entry['keyframes']))
+        if before:
+            entry['baseline'] = before
+            entry['ratio'] = round(entry['seconds'] / before, 3)
+            logging.info('%-24s %8d keyframes %10.4f s (%.2fx)', entry['name'], entry['keyframes'], entry['seconds'], entry['ratio'])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark League Director sequences and the sequencer without a display or game.')
+    parser.add_argument('--suite', choices=['all', 'sequence', 'sequencer'], default='all', help='Data model, widgets or both')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='Keyframe counts to generate')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement, the fastest is kept')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the generated sequences')
+    parser.add_argument('--output', default=None, help='Write results as json to this file')
+    parser.add_argument('--compare', default=None, help='Previous results file to compare against')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)-8s] %(message)s')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QCoreApplication(sys.argv) if args.suite == 'sequence' else QApplication(sys.argv)
+    results = []
+    for count in args.sizes:
+        if args.suite in ('all', 'sequence'):
+            results.extend(benchmarkSequence(count, args.repeat, args.seed))
+        if args.suite in ('all', 'sequencer'):
+            results.extend(benchmarkSequencer(count, args.repeat, args.seed))
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(results, json.load(f))
+    report = {
+        'revision': revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pyside': PYSIDE_VERSION,
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -135,13 +135,25 @@ class KeyboardHook(QThread):
 
 
 class Bindings(QObject):
+    """
+    Owns the shortcuts for every action. Actions sharing a key sequence are
+    kept in an index rebuilt whenever a binding changes, and each subsystem
+    registers a dict of action name to handler to be called directly.
+    Triggered actions count as held until their key is released.
+    """
     triggered = Signal(str)
+    released = Signal(str)
 
     def __init__(self, window, bindings, options):
         QObject.__init__(self)
         self.labels = {name : label for name, label, _ in options}
         self.shortcuts = {}
         self.defaults = {}
+        self.handlers = {}
+        self.sequences = {}
+        self.index = {}
+        self.keys = {}
+        self.held = {}
         for name, _, default in options:
             if name in bindings:
                 sequence = QKeySequence(bindings[name])
@@ -154,23 +166,51 @@ class Bindings(QObject):
             shortcut.activatedAmbiguously.connect(functools.partial(self.activated, name))
             self.shortcuts[name] = shortcut
             self.defaults[name] = default
+        self.rebuild()
         self.hook = KeyboardHook(window)
         self.hook.start()
 
+    def rebuild(self):
+        self.sequences = {name : shortcut.key().toString() for name, shortcut in self.shortcuts.items()}
+        self.index = {}
+        self.keys = {}
+        for name, sequence in self.sequences.items():
+            if sequence:
+                self.index.setdefault(sequence, []).append(name)
+                self.keys[name] = self.shortcuts[name].key()[0].key()
+
+    def register(self, handlers):
+        for name, handler in handlers.items():
+            self.handlers.setdefault(name, []).append(handler)
+
     def activated(self, name):
-        sequence = self.shortcuts[name].key()
-        for name, shortcut in self.shortcuts.items():
-            if shortcut.key() == sequence:
-                self.triggered.emit(name)
+        if not self.held:
+            QCoreApplication.instance().installEventFilter(self)
+        for action in self.index.get(self.sequences[name], ()):
+            self.held[action] = self.keys[action]
+            for handler in self.handlers.get(action, ()):
+                handler()
+            self.triggered.emit(action)
+
+    def eventFilter(self, object, event):
+        if event.type() == QEvent.KeyRelease and not event.isAutoRepeat():
+            for action, key in list(self.held.items()):
+                if key == event.key():
+                    del self.held[action]
+                    self.released.emit(action)
+            if not self.held:
+                QCoreApplication.instance().removeEventFilter(self)
+        return False
 
     def getBindings(self):
-        return {name : shortcut.key().toString() for name, shortcut in self.shortcuts.items()}
+        return dict(self.sequences)
 
     def getOptions(self):
-        return [(name, label, self.shortcuts[name].key().toString()) for name, label, default in self.options]
+        return [(name, label, self.sequences[name]) for name, label in self.labels.items()]
 
     def setBinding(self, name, sequence):
         self.shortcuts[name].setKey(QKeySequence(sequence))
+        self.rebuild()
 
     def getLabel(self, name):
         return self.labels[name]
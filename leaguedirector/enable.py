@@ -1,9 +1,36 @@
 import os
+import json
+import time
 import psutil
 import platform
 import logging
+import threading
 import subprocess
+import concurrent.futures
 from PySide6.QtCore import *
+from leaguedirector.widgets import userpath
+
+# Wine, Lutris and Proton locations searched on linux, relative to home
+LINUX_ROOTS = [
+    '.wine',
+    'Games',
+    '.local/share/lutris',
+    '.local/share/Steam/steamapps/compatdata',
+    '.var/app/net.lutris.Lutris/data/lutris',
+]
+
+# Directories below a root the linux scan descends into at most, how many
+# it visits in total, and the names it never descends into
+SCAN_DEPTH = 6
+SCAN_LIMIT = 20000
+SCAN_THREADS = 8
+SCAN_PRUNE = {'windows', 'dosdevices', 'users', 'programdata', 'node_modules', 'shadercache', '__pycache__'}
+
+# Seconds a cached linux scan of a root is trusted before it is repeated
+SCAN_MAX_AGE = 24 * 60 * 60
+
+# Extra directories to scan on linux, set from the connect window
+searchRoots = []
 
 def findWindowsInstalled(paths):
     """
@@ -58,23 +85,219 @@ def findMacRunning(paths):
             if len(path) == 2:
                 paths.append(path[0])
 
-def findInstalledGames():
-    paths = []
+def linuxRoots():
+    roots = [os.path.join(os.path.expanduser('~'), root) for root in LINUX_ROOTS]
+    if os.environ.get('WINEPREFIX'):
+        roots.append(os.environ['WINEPREFIX'])
+    roots += searchRoots
+    return sorted(set(os.path.abspath(root) for root in roots if os.path.isdir(root)))
+
+def scanDirectory(path):
+    """
+    One step of the linux scan. Returns the directory itself when it is a
+    game install, otherwise the subdirectories worth descending into.
+    Symlinks are not followed, wine's dosdevices would lead back to /.
+    """
+    try:
+        entries = [entry for entry in os.scandir(path) if entry.is_dir(follow_symlinks=False)]
+    except OSError:
+        return None, []
+    names = set(entry.name for entry in entries)
+    if names & {'Config', 'Game', 'DATA'} and configFilePath(path) is not None:
+        return path, []
+    return None, [
+        entry.path for entry in entries
+        if not entry.name.startswith('.') and entry.name.lower() not in SCAN_PRUNE
+    ]
+
+def scanInstalls(root):
+    """
+    Breadth first walk of root at most SCAN_DEPTH deep, each level scanned
+    in parallel, that stops descending at any install it finds.
+    """
+    installs = []
+    visited = 0
+    level = [root]
+    with concurrent.futures.ThreadPoolExecutor(SCAN_THREADS) as executor:
+        for _ in range(SCAN_DEPTH + 1):
+            if not level:
+                break
+            level = level[:SCAN_LIMIT - visited]
+            visited += len(level)
+            children = []
+            for install, subdirectories in executor.map(scanDirectory, level):
+                if install is not None:
+                    installs.append(install)
+                children += subdirectories
+            level = children
+    if visited >= SCAN_LIMIT:
+        logging.warning('Stopped scanning %s after %d directories', root, visited)
+    return installs
 
-    # Find running games on windows
+def findLinuxInstalled(paths):
+    """
+    Scan wine prefixes and the user's search roots for game installs. The
+    installs found under each root are cached on disk and reused while
+    they still exist and the scan is younger than SCAN_MAX_AGE.
+    """
+    path = userpath('cache', 'linux.json')
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    now = time.time()
+    for root in linuxRoots():
+        entry = cache.get(root)
+        valid = entry is not None and now - entry['time'] < SCAN_MAX_AGE
+        if not valid or not all(configFilePath(install) for install in entry['installs']):
+            entry = cache[root] = {'time': now, 'installs': scanInstalls(root)}
+        paths.extend(entry['installs'])
+    try:
+        with open(path + '.tmp', 'w') as f:
+            json.dump(cache, f, indent=4)
+        os.replace(path + '.tmp', path)
+    except OSError as exception:
+        logging.error('Failed to save scan cache: {} {}'.format(path, exception))
+
+def findLinuxRunning(paths):
+    """
+    Find clients running under wine. Their command line holds the windows
+    path of the executable, which is mapped into the process's prefix.
+    """
+    for process in psutil.process_iter(attrs=['cmdline']):
+        command = ' '.join(process.info['cmdline'] or [])
+        index = command.lower().find('leagueclient.exe')
+        drive = command.rfind(':\\', 0, index)
+        if index < 0 or drive < 1:
+            continue
+        try:
+            prefix = process.environ().get('WINEPREFIX', os.path.expanduser('~/.wine'))
+        except (psutil.AccessDenied, psutil.NoSuchProcess):
+            continue
+        folder = command[drive + 2:index].strip('\\').replace('\\', '/')
+        paths.append(os.path.join(prefix, 'drive_{}'.format(command[drive - 1].lower()), folder))
+
+def discoverySources():
     if platform.system() == 'Windows':
-        findWindowsInstalled(paths)
-        findWindowsRunning(paths)
-        findWindowsCached(paths)
+        return [findWindowsInstalled, findWindowsRunning, findWindowsCached]
     elif platform.system() == 'Darwin':
-        findMacInstalled(paths)
-        findMacRunning(paths)
-    
-    # Make sure all paths are valid and formatted the same
+        return [findMacInstalled, findMacRunning]
+    elif platform.system() == 'Linux':
+        return [findLinuxInstalled, findLinuxRunning]
+    return []
+
+def querySource(source):
+    """
+    Run one discovery source and return the config files of the installs
+    it found, formatted the same way.
+    """
+    paths = []
+    try:
+        source(paths)
+    except Exception as exception:
+        logging.error('Game Discovery Failed: {} {}'.format(source.__name__, exception))
     paths = [configFilePath(os.path.abspath(path)) for path in paths]
+    return [os.path.normcase(path) for path in paths if path is not None]
 
-    # Remove nones + duplicates and sort
-    return sorted(list(set([os.path.normcase(path) for path in paths if path is not None])))
+def findInstalledGames():
+    sources = discoverySources()
+    with concurrent.futures.ThreadPoolExecutor(max(1, len(sources))) as executor:
+        results = executor.map(querySource, sources)
+    return sorted(set(path for paths in results for path in paths))
+
+class GameDiscovery(QObject):
+    """
+    Finds game installs off the GUI thread. Installs from the cache are
+    reported straight away, then every discovery source is queried in
+    parallel on a worker and each new install is reported as it turns up.
+    The enabled state of each game.cfg is kept in configCache together with
+    the modification time and size it was read at and saved to disk, so
+    unchanged configs are never parsed again. Installs whose config has
+    gone are dropped from the cache and reported as removed.
+    """
+    found = Signal(str, bool)
+    removed = Signal(str)
+    finished = Signal()
+
+    def __init__(self):
+        QObject.__init__(self)
+        self.path = userpath('cache', 'games.json')
+        self.lock = threading.Lock()
+        self.thread = None
+        self.restart = False
+        self.reported = set()
+        self.finished.connect(self.done)
+        try:
+            with open(self.path, 'r') as f:
+                for path, entry in json.load(f).items():
+                    configCache.setdefault(path, ((entry['mtime'], entry['size']), entry['enabled']))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            self.restart = True
+            return
+        for path in list(configCache):
+            self.report(path)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        seen = set()
+        sources = discoverySources()
+        with concurrent.futures.ThreadPoolExecutor(max(1, len(sources))) as executor:
+            for future in concurrent.futures.as_completed([executor.submit(querySource, source) for source in sources]):
+                for path in future.result():
+                    if path not in seen:
+                        seen.add(path)
+                        self.report(path)
+        for path in self.reported - seen:
+            self.isEnabled(path)
+        self.saveCache()
+        self.finished.emit()
+
+    def done(self):
+        self.thread.join()
+        if self.restart:
+            self.restart = False
+            self.start()
+
+    def report(self, path):
+        enabled = self.isEnabled(path)
+        if enabled is not None:
+            self.reported.add(path)
+            self.found.emit(path, enabled)
+
+    def isEnabled(self, path):
+        """
+        Enabled state of a config, None once the file no longer exists.
+        """
+        if not os.path.isfile(path):
+            configCache.pop(path, None)
+            self.reported.discard(path)
+            self.removed.emit(path)
+            return None
+        return isGameEnabled(path)
+
+    def setEnabled(self, path, enabled):
+        setGameEnabled(path, enabled)
+        self.isEnabled(path)
+        self.saveCache()
+
+    def saveCache(self):
+        cache = {
+            path: {'mtime': key[0], 'size': key[1], 'enabled': enabled}
+            for path, (key, enabled) in configCache.copy().items()
+        }
+        with self.lock:
+            try:
+                with open(self.path + '.tmp', 'w') as f:
+                    json.dump(cache, f, indent=4)
+                os.replace(self.path + '.tmp', self.path)
+            except OSError as exception:
+                logging.error('Failed to save game cache: {} {}'.format(self.path, exception))
 
 def configFilePath(path):
     path = os.path.abspath(path)
@@ -90,15 +313,101 @@ def configFilePath(path):
     if os.path.isfile(config):
         return config
 
+# Parsed EnableReplayApi values by config path, along with the modification
+# time and size of the file they were read from
+configCache = {}
+
+def readConfigValue(path, name, section='General'):
+    """
+    Value of a key in a game.cfg style ini file, None if it is not set.
+    Only the lines are scanned, nothing else in the file is interpreted.
+    A leading byte order mark is ignored.
+    """
+    current = None
+    with open(path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+        for line in f:
+            line = line.lstrip('\ufeff').strip()
+            if line.startswith('[') and line.endswith(']'):
+                current = line[1:-1].strip()
+            elif current is not None and current.lower() == section.lower() and '=' in line:
+                key, value = line.split('=', 1)
+                if key.strip().lower() == name.lower():
+                    return value.strip().strip('"')
+
+def writeConfigValue(path, name, value, section='General'):
+    """
+    Set a key in a game.cfg style ini file by editing only its line, or
+    adding one when missing. The file is replaced atomically and left
+    alone when the value is already set, a byte order mark is kept as is.
+    Returns whether it was written.
+    """
+    with open(path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as f:
+        lines = f.read().splitlines(True)
+    newline = '\r\n' if any(line.endswith('\r\n') for line in lines) else '\n'
+    current = None
+    header = None
+    for index, line in enumerate(lines):
+        text = line.lstrip('\ufeff').strip()
+        if text.startswith('[') and text.endswith(']'):
+            current = text[1:-1].strip()
+            if current.lower() == section.lower():
+                header = index
+        elif current is not None and current.lower() == section.lower() and '=' in text:
+            key, old = text.split('=', 1)
+            if key.strip().lower() == name.lower():
+                if old.strip().strip('"') == value:
+                    return False
+                ending = line[len(line.rstrip('\r\n')):] or newline
+                lines[index] = '{}={}{}'.format(key.strip(), value, ending)
+                break
+    else:
+        if header is None:
+            if lines and not lines[-1].endswith('\n'):
+                lines[-1] += newline
+            lines += ['[{}]{}'.format(section, newline)]
+            header = len(lines) - 1
+        elif not lines[header].endswith('\n'):
+            lines[header] += newline
+        lines.insert(header + 1, '{}={}{}'.format(name, value, newline))
+    temp = path + '.tmp'
+    with open(temp, 'w', encoding='utf-8', errors='surrogateescape', newline='') as f:
+        f.write(''.join(lines))
+    os.replace(temp, path)
+    return True
+
 def isGameEnabled(path):
-    if os.path.isfile(path):
-        settings = QSettings(path, QSettings.IniFormat)
-        value = settings.value('EnableReplayApi', False)
-        return str(value).lower() in ['true', '1']
-    return False
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = configCache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    try:
+        value = readConfigValue(path, 'EnableReplayApi')
+    except OSError as exception:
+        logging.error('Failed to read {} {}'.format(path, exception))
+        return False
+    enabled = str(value).lower() in ['true', '1']
+    configCache[path] = (key, enabled)
+    return enabled
 
 def setGameEnabled(path, enabled):
     if os.path.isfile(path):
         logging.info('Setting EnableReplayApi %s=%d', path, enabled)
-        settings = QSettings(path, QSettings.IniFormat)
-        settings.setValue('EnableReplayApi', int(enabled))
+        try:
+            writeConfigValue(path, 'EnableReplayApi', str(int(enabled)))
+        except OSError as exception:
+            logging.error('Failed to write {} {}'.format(path, exception))
+        configCache.pop(path, None)
+
+def setGamesEnabled(paths, enabled):
+    """
+    Enable or disable the replay api of many installs at once, returns
+    the new state of each.
+    """
+    paths = list(paths)
+    with concurrent.futures.ThreadPoolExecutor(max(1, min(8, len(paths)))) as executor:
+        list(executor.map(lambda path: setGameEnabled(path, enabled), paths))
+    return {path: isGameEnabled(path) for path in paths}
@@ -0,0 +1,96 @@
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+
+# Identical messages within this many seconds are counted instead of logged
+REPEAT_INTERVAL = 10.0
+
+# Size in bytes a log file may grow to before it is rotated, and how many
+# rotated files are kept
+LOG_SIZE = 5 * 1024 * 1024
+LOG_BACKUPS = 20
+
+
+class RepeatFilter(logging.Filter):
+    """
+    Drops records repeating a message logged less than REPEAT_INTERVAL
+    ago. The first repeat after the interval goes through with the number
+    of dropped copies appended. expire() reports counts older than the
+    interval so a burst followed by silence is still summarised, and
+    flush() reports any still outstanding.
+    """
+
+    def __init__(self):
+        logging.Filter.__init__(self)
+        self.lock = threading.Lock()
+        self.recent = {}
+        self.pruned = time.time()
+
+    def filter(self, record):
+        key = (record.levelno, record.getMessage())
+        now = time.time()
+        with self.lock:
+            if key in self.recent:
+                since, count = self.recent[key]
+                if now - since < REPEAT_INTERVAL:
+                    self.recent[key] = (since, count + 1)
+                    return False
+                if count:
+                    record.msg = '{} (repeated {} times)'.format(key[1], count)
+                    record.args = None
+            elif now - self.pruned > REPEAT_INTERVAL:
+                self.pruned = now
+                self.recent = {k: v for k, v in self.recent.items() if v[1] or now - v[0] < REPEAT_INTERVAL}
+            self.recent[key] = (now, 0)
+        return True
+
+    def expire(self):
+        now = time.time()
+        with self.lock:
+            pending = [(key, count) for key, (since, count) in self.recent.items() if count and now - since >= REPEAT_INTERVAL]
+            for key, _ in pending:
+                self.recent[key] = (now, 0)
+        self.report(pending)
+
+    def flush(self):
+        with self.lock:
+            pending = [(key, count) for key, (_, count) in self.recent.items() if count]
+            self.recent = {}
+        self.report(pending)
+
+    def report(self, pending):
+        for (level, message), count in pending:
+            logging.log(level, '%s (repeated %d times)', message, count)
+
+
+def setupQueue(logger, *handlers):
+    """
+    Routes the logger through a queue drained by a listener thread that
+    owns the given handlers, so callers never wait on file or console
+    output. Repeats are collapsed before they are queued and their counts
+    reported every REPEAT_INTERVAL by a background thread. The listener
+    is flushed and stopped at exit.
+    """
+    records = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    repeats = RepeatFilter()
+    handler.addFilter(repeats)
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    logger.addHandler(handler)
+    stopped = threading.Event()
+
+    def expire():
+        while not stopped.wait(REPEAT_INTERVAL):
+            repeats.expire()
+    threading.Thread(target=expire, name='RepeatFilter', daemon=True).start()
+
+    def stop():
+        stopped.set()
+        repeats.flush()
+        listener.stop()
+    atexit.register(stop)
+    return listener
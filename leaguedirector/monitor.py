@@ -0,0 +1,256 @@
+import os
+import sys
+import time
+import json
+import marshal
+import logging
+import threading
+import traceback
+import functools
+import collections
+from PySide6.QtCore import *
+
+# Handlers running longer than this many milliseconds are logged with a stack
+SLOW_HANDLER = 50
+
+# Milliseconds between the samples of how late the event loop runs
+LAG_INTERVAL = 100
+
+# Durations kept per handler for the rolling percentiles
+WINDOW = 1000
+
+# Seconds between the stack samples taken by the profiler
+PROFILE_INTERVAL = 0.005
+
+
+class Monitor(object):
+    """
+    Opt in instrumentation of the GUI thread. While enabled every handler
+    run through measure() is timed, and a watchdog thread captures the GUI
+    thread's stack once the outermost handler runs past the threshold, so
+    a slow handler is logged together with where it spent its time. Event
+    loop lag is sampled by how late a repeating timer fires. The latest
+    WINDOW durations of each handler are kept for percentiles.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.threshold = SLOW_HANDLER / 1000.0
+        self.samples = {}
+        self.current = None
+        self.stack = None
+        self.ident = None
+        self.lock = threading.Lock()
+        self.thread = None
+        self.timer = None
+        self.expected = 0
+
+    def setEnabled(self, enabled):
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        if enabled:
+            self.ident = threading.get_ident()
+            self.expected = time.perf_counter() + LAG_INTERVAL / 1000.0
+            self.timer = QTimer()
+            self.timer.setTimerType(Qt.PreciseTimer)
+            self.timer.timeout.connect(self.sampleLag)
+            self.timer.start(LAG_INTERVAL)
+            self.thread = threading.Thread(target=self.watch, daemon=True)
+            self.thread.start()
+            logging.info('Performance monitor enabled, logging handlers slower than %dms', self.threshold * 1000)
+        else:
+            self.timer.stop()
+            self.timer = None
+            self.thread = None
+            logging.info('Performance monitor disabled')
+
+    def setThreshold(self, milliseconds):
+        self.threshold = milliseconds / 1000.0
+
+    def wrap(self, callback, name=None):
+        name = name or getattr(callback, '__qualname__', None) or repr(callback)
+        return functools.partial(self.measure, name, callback)
+
+    def measure(self, name, callback, *args):
+        if not self.enabled:
+            return callback(*args)
+        outer = self.current is None
+        start = time.perf_counter()
+        if outer:
+            with self.lock:
+                self.current = start
+                self.stack = None
+        try:
+            return callback(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.record(name, elapsed)
+            if outer:
+                with self.lock:
+                    stack = self.stack
+                    self.current = None
+                    self.stack = None
+                if elapsed > self.threshold:
+                    trace = '\n' + ''.join(stack) if stack else ''
+                    logging.warning('Slow handler %s took %.1fms%s', name, elapsed * 1000, trace)
+
+    def record(self, name, elapsed):
+        if name not in self.samples:
+            self.samples[name] = collections.deque(maxlen=WINDOW)
+        self.samples[name].append(elapsed)
+
+    def sampleLag(self):
+        now = time.perf_counter()
+        self.record('Event loop lag', max(0.0, now - self.expected))
+        self.expected = now + LAG_INTERVAL / 1000.0
+
+    def watch(self):
+        while self.enabled:
+            time.sleep(self.threshold / 2)
+            with self.lock:
+                if self.current is not None and self.stack is None:
+                    if time.perf_counter() - self.current > self.threshold:
+                        frame = sys._current_frames().get(self.ident)
+                        if frame is not None:
+                            self.stack = traceback.format_stack(frame)
+
+    def reset(self):
+        self.samples = {}
+
+    def percentiles(self):
+        """
+        Rows of name, count, p50, p90, p99 and max in milliseconds, the
+        handlers with the worst p99 first.
+        """
+        rows = []
+        for name, samples in list(self.samples.items()):
+            values = sorted(samples)
+            if values:
+                def percentile(fraction):
+                    return values[min(len(values) - 1, int(fraction * len(values)))] * 1000
+                rows.append((name, len(values), percentile(0.5), percentile(0.9), percentile(0.99), values[-1] * 1000))
+        return sorted(rows, key=lambda row: row[4], reverse=True)
+
+    def export(self, path):
+        report = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'threshold': self.threshold * 1000,
+            'handlers': [
+                {'name': name, 'count': count, 'p50': p50, 'p90': p90, 'p99': p99, 'max': peak}
+                for name, count, p50, p90, p99, peak in self.percentiles()
+            ],
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=4)
+        logging.info('Exported performance report to %s', path)
+
+
+class Profiler(object):
+    """
+    In process sampling profiler. While running a background thread
+    samples the stack of every other thread each PROFILE_INTERVAL, and on
+    stop the samples are written as collapsed stacks for flame graph tools
+    and as a pstats file built from the same samples, both named with a
+    session tag. Times are the share of samples scaled to the wall time
+    and call counts in the pstats file are sample counts.
+    """
+
+    def __init__(self):
+        self.running = False
+        self.thread = None
+        self.directory = None
+        self.tag = None
+        self.samples = collections.Counter()
+        self.ticks = 0
+        self.started = 0
+
+    def toggle(self, directory):
+        if self.running:
+            return self.stop()
+        self.start(directory)
+
+    def start(self, directory):
+        if self.running:
+            return
+        self.running = True
+        self.directory = directory
+        self.tag = '{}-{}'.format(time.strftime('%Y%m%d-%H%M%S'), os.getpid())
+        self.samples = collections.Counter()
+        self.ticks = 0
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self.sample, name='Profiler', daemon=True)
+        self.thread.start()
+        logging.info('Profiler started (%s)', self.tag)
+
+    def stop(self):
+        if not self.running:
+            return []
+        self.running = False
+        self.thread.join()
+        self.thread = None
+        seconds = (time.perf_counter() - self.started) / max(1, self.ticks)
+        paths = [
+            os.path.join(self.directory, 'profile-{}.collapsed'.format(self.tag)),
+            os.path.join(self.directory, 'profile-{}.pstats'.format(self.tag)),
+        ]
+        try:
+            self.writeCollapsed(paths[0])
+            self.writeStats(paths[1], seconds)
+        except OSError as exception:
+            logging.error('Profile Failed: {} {}'.format(self.directory, exception))
+            return []
+        logging.info('Profiler stopped after %d samples, wrote %s', self.ticks, ', '.join(paths))
+        return paths
+
+    def sample(self):
+        ident = threading.get_ident()
+        while self.running:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread, frame in sys._current_frames().items():
+                if thread != ident:
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame.f_code)
+                        frame = frame.f_back
+                    stack.reverse()
+                    self.samples[(names.get(thread, 'Thread-{}'.format(thread)), tuple(stack))] += 1
+            self.ticks += 1
+            time.sleep(PROFILE_INTERVAL)
+
+    def label(self, code):
+        return '{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+    def writeCollapsed(self, path):
+        with open(path, 'w') as f:
+            for (name, stack), count in self.samples.items():
+                f.write('{};{} {}\n'.format(name, ';'.join(self.label(code) for code in stack), count))
+
+    def writeStats(self, path, seconds):
+        stats = {}
+        def entry(code):
+            key = (code.co_filename, code.co_firstlineno, code.co_name)
+            if key not in stats:
+                stats[key] = [0, 0, 0.0, 0.0, {}]
+            return key, stats[key]
+        for (_, stack), count in self.samples.items():
+            seen = set()
+            caller = None
+            for code in stack:
+                key, value = entry(code)
+                if key not in seen:
+                    seen.add(key)
+                    value[0] += count
+                    value[1] += count
+                    value[3] += count * seconds
+                if caller is not None:
+                    value[4][caller] = value[4].get(caller, 0) + count
+                caller = key
+            if stack:
+                entry(stack[-1])[1][2] += count * seconds
+        with open(path, 'wb') as f:
+            marshal.dump({key: tuple(value) for key, value in stats.items()}, f)
+
+
+monitor = Monitor()
+profiler = Profiler()
@@ -2,34 +2,40 @@ import copy
 import threading
 import webbrowser
 import statistics
-from operator import attrgetter, methodcaller
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from operator import attrgetter, itemgetter
 from PySide6.QtGui import *
 from PySide6.QtCore import *
 from PySide6.QtWidgets import *
 from leaguedirector.widgets import *
+from leaguedirector.monitor import monitor
+from leaguedirector.bake import BLENDS, linear, snap, valueComponents, flattenValue
 
 PRECISION = 10000.0
 SNAPPING = 4
 OVERLAP = 4
 ADJACENT = 0.05
+CURVE_SAMPLES = 24
+CURVE_PICK = 6
+CURVE_DENSITY = 3
+CULLING = 0.5
+DENSITY = 6
+DENSITY_BUCKET = 3
 
 
 class SequenceKeyframe(QGraphicsPixmapItem):
 
     def __init__(self, api, item, track):
-        self.pixmapNormal = QPixmap(respath('kfnormal.png'))
-        self.pixmapOverlap = QPixmap(respath('kfoverlap.png'))
-        QGraphicsPixmapItem.__init__(self, self.pixmapNormal, track)
+        QGraphicsPixmapItem.__init__(self, cachedPixmap('kfnormal.png'), track)
         self.api = api
         self.track = track
         self.item = item
-        self.duplicate = None
+        self.overlapping = False
         self.setCursor(Qt.ArrowCursor)
         self.setShapeMode(QGraphicsPixmapItem.BoundingRectShape)
         flags = QGraphicsItem.ItemIgnoresTransformations
-        flags |= QGraphicsItem.ItemIsMovable
         flags |= QGraphicsItem.ItemIsSelectable
-        flags |= QGraphicsItem.ItemSendsGeometryChanges
         self.setFlags(flags)
         self.setOffset(-10, 3)
         self.update()
@@ -44,10 +50,12 @@ class SequenceKeyframe(QGraphicsPixmapItem):
     @time.setter
     def time(self, value):
         if self.item['time'] != value:
+            previous = self.item['time']
             self.item['time'] = value
             self.api.sequence.update()
-            self.track.updateOverlap()
+            self.track.moveKeyframe(self.item, previous)
             self.update()
+            self.updateSelection()
 
     @property
     def valueType(self):
@@ -73,6 +81,7 @@ class SequenceKeyframe(QGraphicsPixmapItem):
             self.item['value'] = value
             self.api.sequence.update()
             self.update()
+            self.updateSelection()
 
     @property
     def blend(self):
@@ -84,75 +93,202 @@ class SequenceKeyframe(QGraphicsPixmapItem):
             self.item['blend'] = value
             self.api.sequence.update()
             self.update()
+            self.updateSelection()
 
     def update(self):
-        self.setPos(int(self.time * PRECISION), 0)
+        self.updatePosition()
         self.setToolTip(self.tooltip())
 
+    def updatePosition(self):
+        self.setPos(int(self.time * PRECISION), 0)
+
     def tooltip(self):
         value = self.value
         if isinstance(value, dict):
             value = tuple(value.values())
         return 'Time: {}\nBlend: {}\nValue: {}'.format(self.time, self.blend, value)
 
+    def updateSelection(self):
+        if self.isSelected() and self.scene() is not None:
+            self.viewport().selection.edit(self)
+
     def delete(self):
-        self.api.sequence.removeKeyframe(self.track.name, self.item)
-        self.scene().removeItem(self)
+        self.track.deleteKeyframe(self)
 
     def setOverlapping(self, overlapping):
-        self.setPixmap(self.pixmapOverlap if overlapping else self.pixmapNormal)
+        if self.overlapping != overlapping:
+            self.overlapping = overlapping
+            self.setPixmap(cachedPixmap('kfoverlap.png' if overlapping else 'kfnormal.png'))
+
+    def itemChange(self, change, value):
+        if change == QGraphicsItem.ItemSelectedHasChanged:
+            if value:
+                self.viewport().selection.add(self)
+            else:
+                self.viewport().selection.discard(self)
+        elif change == QGraphicsItem.ItemSceneChange and value is None and self.isSelected():
+            self.viewport().selection.discard(self)
+        return QGraphicsPixmapItem.itemChange(self, change, value)
 
     def mouseDoubleClickEvent(self, event):
         if event.button() == Qt.LeftButton and event.modifiers() == Qt.NoModifier:
-            if len(self.scene().selectedItems()) < 2:
+            if self.viewport().selection.count() < 2:
                 self.api.playback.pause(self.time)
                 event.accept()
         QGraphicsPixmapItem.mouseDoubleClickEvent(self, event)
 
+    def mousePressEvent(self, event):
+        QGraphicsPixmapItem.mousePressEvent(self, event)
+        if event.button() == Qt.LeftButton and self.isSelected():
+            self.viewport().beginDrag(self, event.scenePos())
+
+    def mouseMoveEvent(self, event):
+        self.viewport().moveDrag(event.scenePos())
+
     def mouseReleaseEvent(self, event):
-        for key in self.scene().selectedItems():
-            if isinstance(key, SequenceKeyframe):
-                key.duplicate = None
+        self.viewport().endDrag()
         QGraphicsPixmapItem.mouseReleaseEvent(self, event)
 
-    def itemChange(self, change, value):
-        if change == QGraphicsItem.ItemPositionChange:
-            value.setX(self.performSnapping(value.x()))
-            value.setX(max(0, value.x()))
-            value.setY(0)
-            self.performDuplication()
-            return value
-        elif change == QGraphicsItem.ItemPositionHasChanged:
-            if value:
-                self.time = value.x() / PRECISION
-        return QGraphicsPixmapItem.itemChange(self, change, value)
 
-    def performDuplication(self):
-        if self.isSelected() and self.duplicate is None:
-            if QApplication.mouseButtons() == Qt.LeftButton:
-                if QApplication.keyboardModifiers() == Qt.AltModifier:
-                    self.duplicate = self.track.duplicateKeyframe(self)
-
-    def performSnapping(self, time):
-        if QApplication.mouseButtons() == Qt.LeftButton:
-            if QApplication.keyboardModifiers() == Qt.NoModifier:
-                if len(self.scene().selectedItems()) < 2:
-                    scene = self.scene()
-                    viewport = self.viewport()
-                    screenPosition = viewport.mapFromScene(time, 0).x()
-                    left = viewport.mapToScene(screenPosition - SNAPPING, 0).x()
-                    right = viewport.mapToScene(screenPosition + SNAPPING, 0).x()
-                    items = scene.items(left, float(0), right - left, scene.height(), Qt.IntersectsItemBoundingRect, Qt.AscendingOrder)
-                    for item in items:
-                        if isinstance(item, SequenceKeyframe):
-                            if item != self and not item.isSelected() and item.track != self.track:
-                                return item.x()
-                        elif isinstance(item, SequenceTime):
-                            return self.api.playback.time * PRECISION
-        return time
+class SequenceDrag(object):
+    """
+    Moves the selected keyframes as a group. The selection and original
+    times are captured once at press, each mouse move applies one time
+    delta to the keyframe data and item positions, and the track indexes
+    and sequence are only updated once on release.
+    """
+
+    def __init__(self, view, anchor, position):
+        self.view = view
+        self.api = view.api
+        self.anchor = anchor
+        self.origin = position.x()
+        self.keyframes = [(key, key.time) for key in view.selectedKeyframes()]
+        self.ignore = set(id(key.item) for key, _ in self.keyframes)
+        self.earliest = min(time for _, time in self.keyframes)
+        self.anchorTime = anchor.time
+        self.duplicated = False
+        self.moved = False
+
+    def move(self, position):
+        if not self.duplicated and QApplication.keyboardModifiers() == Qt.AltModifier:
+            self.duplicated = True
+            for key, _ in self.keyframes:
+                key.track.duplicateKeyframe(key)
+        delta = self.performSnapping((position.x() - self.origin) / PRECISION)
+        delta = max(delta, -self.earliest)
+        for key, time in self.keyframes:
+            key.item['time'] = round((time + delta) * PRECISION) / PRECISION
+            key.updatePosition()
+        self.moved = True
+
+    def performSnapping(self, delta):
+        if QApplication.keyboardModifiers() != Qt.NoModifier:
+            return delta
+        distance = SNAPPING / (self.view.transform().m11() * PRECISION)
+        time = self.anchorTime + delta
+        snapped = None
+        if abs(self.api.playback.time - time) < distance:
+            snapped = self.api.playback.time
+        for track in self.view.tracks.values():
+            if track is not self.anchor.track:
+                for keyframe in track.keyframesBetween(time - distance, time + distance):
+                    if id(keyframe) not in self.ignore:
+                        if snapped is None or abs(keyframe['time'] - time) < abs(snapped - time):
+                            snapped = keyframe['time']
+        return delta if snapped is None else snapped - self.anchorTime
+
+    def finish(self):
+        if self.moved:
+            for track in set(key.track for key, _ in self.keyframes):
+                track.reindex()
+            for key, _ in self.keyframes:
+                key.setToolTip(key.tooltip())
+                key.updateSelection()
+            self.api.sequence.update()
+
+
+class SequenceSelection(QObject):
+    """
+    Selected keyframe items and the aggregates the inspector shows for them.
+    Items report selection and edits as they happen, so the counts are kept
+    up to date without scanning the scene and the changed signal is only
+    emitted once per pass of the event loop.
+    """
+    changed = Signal()
+
+    def __init__(self):
+        QObject.__init__(self)
+        self.items = {}
+        self.times = Counter()
+        self.blends = Counter()
+        self.valueTypes = Counter()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.changed.emit)
+
+    def add(self, item):
+        if item not in self.items:
+            record = (item.time, item.blend, item.valueType)
+            self.items[item] = record
+            self.tally(record, 1)
+            self.timer.start(0)
+
+    def discard(self, item):
+        record = self.items.pop(item, None)
+        if record is not None:
+            self.tally(record, -1)
+            self.timer.start(0)
+
+    def edit(self, item):
+        if item in self.items:
+            self.discard(item)
+            self.add(item)
+
+    def tally(self, record, change):
+        for counter, key in zip((self.times, self.blends, self.valueTypes), record):
+            counter[key] += change
+            if counter[key] <= 0:
+                del counter[key]
+
+    def count(self):
+        return len(self.items)
+
+    def keyframes(self):
+        return list(self.items)
+
+    def first(self):
+        return next(iter(self.items), None)
+
+    def common(self, counter):
+        return next(iter(counter)) if len(counter) == 1 else None
+
+    def summary(self):
+        """
+        Count, common blend, common time, common value type, the value of
+        the first selected item when the type is shared, and the time range.
+        """
+        valueType = self.common(self.valueTypes)
+        value = self.first().value if valueType is not None else None
+        return (
+            len(self.items),
+            self.common(self.blends),
+            self.common(self.times),
+            valueType,
+            value,
+            min(self.times, default=None),
+            max(self.times, default=None),
+        )
 
 
 class SequenceTrack(QGraphicsRectItem):
+    """
+    Keyframes are kept in a time sorted index and graphics items are only
+    created for the ones near the visible part of the timeline. When zoomed
+    out far enough that keyframes would overlap the track paints a density
+    strip instead of individual items. Selected keyframes always keep their
+    items so selection survives scrolling.
+    """
     height = 22
 
     def __init__(self, api, name, index):
@@ -160,12 +296,16 @@ class SequenceTrack(QGraphicsRectItem):
         self.api = api
         self.name = name
         self.index = index
+        self.items = {}
+        self.keyframes = []
+        self.times = []
+        self.visibleRange = None
+        self.condensed = False
+        self.density = None
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
         self.setPos(0, self.height * self.index)
         self.setToolTip(self.api.sequence.getLabel(self.name))
         self.setPen(QPen(QColor(70, 70, 70, 255)))
-        self.updateOverlapTimer = QTimer()
-        self.updateOverlapTimer.timeout.connect(self.updateOverlapNow)
-        self.updateOverlapTimer.setSingleShot(True)
         self.gradient = QLinearGradient(QPointF(0, 0), QPointF(120 * PRECISION, 0))
         self.gradient.setColorAt(0, QColor(30, 30, 30, 255))
         self.gradient.setColorAt(0.49999999999999, QColor(30, 30, 30, 255))
@@ -179,46 +319,173 @@ class SequenceTrack(QGraphicsRectItem):
     def viewport(self):
         return self.scene().views()[0]
 
-    def paint(self, *args):
-        self.updateOverlap()
-        return QGraphicsRectItem.paint(self, *args)
+    def paint(self, painter, option, widget=None):
+        QGraphicsRectItem.paint(self, painter, option, widget)
+        if self.condensed:
+            self.paintDensity(painter, option.exposedRect)
+
+    def paintDensity(self, painter, rect):
+        buckets, keys, size, peak = self.densityBuckets()
+        start = bisect_left(keys, int(rect.left() / PRECISION / size))
+        end = bisect_right(keys, int(rect.right() / PRECISION / size))
+        color = QColor(QApplication.palette().highlight().color())
+        for bucket, count in buckets[start:end]:
+            color.setAlpha(int(80 + 175 * count / peak))
+            painter.fillRect(QRectF(bucket * size * PRECISION, 5, size * PRECISION, self.height - 10), color)
+
+    def densityBuckets(self):
+        size = DENSITY_BUCKET / self.visibleRange[2]
+        if self.density is None or self.density[2] != size:
+            counts = Counter(int(time / size) for time in self.sortedTimes())
+            buckets = sorted(counts.items())
+            self.density = (buckets, [bucket for bucket, _ in buckets], size, max(counts.values(), default=1))
+        return self.density
+
+    def invalidateDensity(self):
+        self.density = None
+        if self.condensed:
+            QGraphicsRectItem.update(self)
+
+    def removeItem(self, item):
+        if item.scene() is not None:
+            item.scene().removeItem(item)
+        else:
+            item.setParentItem(None)
 
     def reload(self):
-        for item in self.childItems():
-            if isinstance(item, SequenceKeyframe):
-                self.scene().removeItem(item)
-        for item in self.api.sequence.getKeyframes(self.name):
-            SequenceKeyframe(self.api, item, self)
+        for item in self.items.values():
+            self.removeItem(item)
+        self.items = {}
+        self.keyframes = sorted(self.api.sequence.getKeyframes(self.name), key=itemgetter('time'))
+        self.times = [keyframe['time'] for keyframe in self.keyframes]
+        self.invalidateDensity()
+        self.updateVisible()
+
+    def sortedKeyframes(self):
+        return self.keyframes
+
+    def sortedTimes(self):
+        return self.times
+
+    def keyframesBetween(self, start, end):
+        keyframes = self.sortedKeyframes()
+        return keyframes[bisect_left(self.times, start):bisect_right(self.times, end)]
+
+    def indexOf(self, keyframe, time):
+        keyframes = self.sortedKeyframes()
+        index = bisect_left(self.times, time)
+        while index < len(keyframes) and keyframes[index] is not keyframe:
+            index += 1
+        return index
+
+    def insertIndex(self, keyframe):
+        index = bisect_right(self.times, keyframe['time'])
+        self.keyframes.insert(index, keyframe)
+        self.times.insert(index, keyframe['time'])
+        self.invalidateDensity()
+        return index
+
+    def removeIndex(self, keyframe, time):
+        index = self.indexOf(keyframe, time)
+        if index < len(self.keyframes):
+            del self.keyframes[index]
+            del self.times[index]
+        self.invalidateDensity()
+        return index
+
+    def keyframeItem(self, keyframe):
+        item = self.items.get(id(keyframe))
+        if item is None:
+            item = SequenceKeyframe(self.api, keyframe, self)
+            item.setOverlapping(self.isOverlapping(self.indexOf(keyframe, keyframe['time'])))
+            self.items[id(keyframe)] = item
+        return item
+
+    def setVisibleRange(self, start, end, scale):
+        zoomed = self.visibleRange is None or self.visibleRange[2] != scale
+        self.visibleRange = (start, end, scale)
+        self.updateVisible()
+        if zoomed:
+            self.updateOverlapNow()
+
+    def updateVisible(self):
+        if self.visibleRange is None:
+            return
+        start, end, scale = self.visibleRange
+        keyframes = self.keyframesBetween(start, end)
+        condensed = len(keyframes) * DENSITY > (end - start) * scale
+        visible = set() if condensed else set(id(keyframe) for keyframe in keyframes)
+        for key, item in list(self.items.items()):
+            if key not in visible and not item.isSelected():
+                del self.items[key]
+                self.removeItem(item)
+        if not condensed:
+            for keyframe in keyframes:
+                self.keyframeItem(keyframe)
+        if condensed != self.condensed:
+            self.condensed = condensed
+            QGraphicsRectItem.update(self)
 
     def addKeyframe(self):
         item = self.api.sequence.createKeyframe(self.name)
-        return SequenceKeyframe(self.api, item, self)
+        self.updateOverlapAt(self.insertIndex(item))
+        return self.keyframeItem(item)
 
     def duplicateKeyframe(self, keyframe):
         item = copy.deepcopy(keyframe.item)
         self.api.sequence.appendKeyframe(self.name, item)
-        return SequenceKeyframe(self.api, item, self)
+        self.updateOverlapAt(self.insertIndex(item))
+        return self.keyframeItem(item)
+
+    def deleteKeyframe(self, keyframe):
+        self.api.sequence.removeKeyframe(self.name, keyframe.item)
+        self.items.pop(id(keyframe.item), None)
+        self.removeItem(keyframe)
+        self.updateOverlapAt(self.removeIndex(keyframe.item, keyframe.time))
+
+    def reindex(self):
+        self.keyframes.sort(key=itemgetter('time'))
+        self.times = [keyframe['time'] for keyframe in self.keyframes]
+        self.invalidateDensity()
+        self.updateOverlapNow()
+
+    def moveKeyframe(self, keyframe, previous):
+        self.updateOverlapAt(self.removeIndex(keyframe, previous))
+        self.updateOverlapAt(self.insertIndex(keyframe))
 
     def clearKeyframes(self):
-        for item in self.childItems():
-            if isinstance(item, SequenceKeyframe):
-                item.delete()
+        for item in list(self.api.sequence.getKeyframes(self.name)):
+            self.api.sequence.removeKeyframe(self.name, item)
+        self.reload()
+
+    def overlapDistance(self):
+        if self.visibleRange is None:
+            return 0
+        return OVERLAP / self.visibleRange[2]
+
+    def isOverlapping(self, index):
+        times = self.sortedTimes()
+        distance = self.overlapDistance()
+        if index > 0 and times[index] - times[index - 1] < distance:
+            return True
+        if index + 1 < len(times) and times[index + 1] - times[index] < distance:
+            return True
+        return False
+
+    def updateOverlapAt(self, index):
+        """
+        Refresh the overlap state of the keyframes around an index after
+        a single keyframe was inserted, removed or moved.
+        """
+        keyframes = self.sortedKeyframes()
+        for position in range(max(index - 2, 0), min(index + 2, len(keyframes))):
+            item = self.items.get(id(keyframes[position]))
+            if item is not None:
+                item.setOverlapping(self.isOverlapping(position))
 
     def updateOverlapNow(self):
-        viewport = self.viewport()
-        distance = viewport.mapToScene(OVERLAP, 0).x() - viewport.mapToScene(0, 0).x()
-        previous = None
-        for child in sorted(self.childItems(), key=methodcaller('x')):
-            if isinstance(child, SequenceKeyframe):
-                if previous and abs(child.x() - previous.x()) < distance:
-                    child.setOverlapping(True)
-                    previous.setOverlapping(True)
-                else:
-                    child.setOverlapping(False)
-                previous = child
-
-    def updateOverlap(self):
-        self.updateOverlapTimer.start(100)
+        for item in self.items.values():
+            item.setOverlapping(self.isOverlapping(self.indexOf(item.item, item.time)))
 
     def update(self):
         self.setRect(0, 0, int(self.api.playback.length * PRECISION), self.height)
@@ -242,7 +509,7 @@ class SequenceHeader(QGraphicsRectItem):
         self.text = QGraphicsSimpleTextItem(self.label(), self)
         self.text.setBrush(QApplication.palette().brightText())
         self.text.setPos(145 - self.text.boundingRect().width() - 20, 4)
-        self.button = QGraphicsPixmapItem(QPixmap(respath('plus.png')), self)
+        self.button = QGraphicsPixmapItem(cachedPixmap('plus.png'), self)
         self.button.setPos(140, 4)
         self.button.setCursor(Qt.ArrowCursor)
         self.button.mousePressEvent = lambda event: self.callback(self.name)
@@ -273,18 +540,26 @@ class SequenceTime(QGraphicsLineItem):
 
 class SequenceTrackView(QGraphicsView):
     selectionChanged = Signal()
+    rangeChanged = Signal()
+    keyframesMoved = Signal()
 
-    def __init__(self, api, headers):
+    def __init__(self, api, headers, clock):
         self.api = api
         self.scene = QGraphicsScene()
         QGraphicsView.__init__(self, self.scene)
         self.tracks = {}
-        self.timer = schedule(10, self.animate)
+        self.drag = None
+        self.clock = clock
+        self.clock.tick.connect(self.animate)
+        self.cullTimer = QTimer(self)
+        self.cullTimer.timeout.connect(monitor.wrap(self.updateVisible))
+        self.cullTimer.setSingleShot(True)
         self.scale(1.0 / PRECISION, 1.0)
         self.setDragMode(QGraphicsView.NoDrag)
         self.setAlignment(Qt.AlignLeft | Qt.AlignTop)
         self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
         self.setSizeAdjustPolicy(QAbstractScrollArea.AdjustToContents)
+        self.setViewportUpdateMode(QGraphicsView.MinimalViewportUpdate)
         for index, name in enumerate(self.api.sequence.keys()):
             track = SequenceTrack(self.api, name, index)
             self.scene.addItem(track)
@@ -299,17 +574,33 @@ class SequenceTrackView(QGraphicsView):
         headers.addKeyframe.connect(self.addKeyframe)
         headers.verticalScrollBar().valueChanged.connect(lambda value: self.verticalScrollBar().setValue(value))
         self.verticalScrollBar().valueChanged.connect(lambda value: headers.verticalScrollBar().setValue(value))
-        self.scene.selectionChanged.connect(self.selectionChanged.emit)
+        self.selection = SequenceSelection()
+        self.selection.changed.connect(self.selectionChanged.emit)
+        self.selection.changed.connect(self.scheduleVisible)
+        self.updateVisible()
 
     def reload(self):
         for track in self.tracks.values():
             track.reload()
 
+    def scheduleVisible(self):
+        self.cullTimer.start(0)
+
+    def updateVisible(self):
+        rect = self.mapToScene(self.viewport().rect()).boundingRect()
+        margin = rect.width() * CULLING
+        scale = self.transform().m11() * PRECISION
+        start = (rect.left() - margin) / PRECISION
+        end = (rect.right() + margin) / PRECISION
+        for track in self.tracks.values():
+            track.setVisibleRange(start, end, scale)
+        self.rangeChanged.emit()
+
     def selectedKeyframes(self):
-        return [key for key in self.scene.selectedItems() if isinstance(key, SequenceKeyframe)]
+        return self.selection.keyframes()
 
     def allKeyframes(self):
-        return [key for key in self.scene.items() if isinstance(key, SequenceKeyframe)]
+        return [track.keyframeItem(keyframe) for track in self.tracks.values() for keyframe in track.sortedKeyframes()]
 
     def addKeyframe(self, name):
         self.tracks[name].addKeyframe()
@@ -328,18 +619,19 @@ class SequenceTrackView(QGraphicsView):
 
     def selectAdjacentKeyframes(self):
         for selected in self.selectedKeyframes():
-            for child in self.allKeyframes():
-                if abs(child.time - selected.time) < ADJACENT:
-                    child.setSelected(True)
+            for track in self.tracks.values():
+                for keyframe in track.keyframesBetween(selected.time - ADJACENT, selected.time + ADJACENT):
+                    if abs(keyframe['time'] - selected.time) < ADJACENT:
+                        track.keyframeItem(keyframe).setSelected(True)
 
     def selectNextKeyframe(self):
         selectionSorted = sorted(self.selectedKeyframes(), key=attrgetter('time'))
         trackSelection = {key.track : key for key in selectionSorted}
         for track, selected in trackSelection.items():
-            for child in sorted(track.childItems(), key=attrgetter('time')):
-                if child.time > selected.time:
-                    trackSelection[track] = child
-                    break
+            keyframes = track.sortedKeyframes()
+            index = bisect_right(track.times, selected.time)
+            if index < len(keyframes):
+                trackSelection[track] = track.keyframeItem(keyframes[index])
         self.scene.clearSelection()
         for item in trackSelection.values():
             item.setSelected(True)
@@ -348,14 +640,27 @@ class SequenceTrackView(QGraphicsView):
         selectionSorted = sorted(self.selectedKeyframes(), key=attrgetter('time'), reverse=True)
         trackSelection = {key.track : key for key in selectionSorted}
         for track, selected in trackSelection.items():
-            for child in sorted(track.childItems(), key=attrgetter('time'), reverse=True):
-                if child.time < selected.time:
-                    trackSelection[track] = child
-                    break
+            keyframes = track.sortedKeyframes()
+            index = bisect_left(track.times, selected.time) - 1
+            if index >= 0:
+                trackSelection[track] = track.keyframeItem(keyframes[index])
         self.scene.clearSelection()
         for item in trackSelection.values():
             item.setSelected(True)
 
+    def beginDrag(self, anchor, position):
+        self.drag = SequenceDrag(self, anchor, position)
+
+    def moveDrag(self, position):
+        if self.drag is not None:
+            self.drag.move(position)
+            self.keyframesMoved.emit()
+
+    def endDrag(self):
+        if self.drag is not None:
+            self.drag.finish()
+            self.drag = None
+
     def seekSelectedKeyframe(self):
         selected = [key.time for key in self.selectedKeyframes()]
         if selected:
@@ -364,6 +669,7 @@ class SequenceTrackView(QGraphicsView):
     def update(self):
         for track in self.tracks.values():
             track.update()
+        self.animate()
 
     def mousePressEvent(self, event):
         if event.button() == Qt.RightButton:
@@ -395,9 +701,235 @@ class SequenceTrackView(QGraphicsView):
             self.scale(1.1, 1.0)
         else:
             self.scale(0.9, 1.0)
+        self.scheduleVisible()
+
+    def scrollContentsBy(self, dx, dy):
+        QGraphicsView.scrollContentsBy(self, dx, dy)
+        self.scheduleVisible()
+
+    def resizeEvent(self, event):
+        QGraphicsView.resizeEvent(self, event)
+        self.scheduleVisible()
 
     def animate(self):
-        self.time.setPos(self.api.playback.currentTime * PRECISION, 0)
+        x = self.api.playback.currentTime * PRECISION
+        if x != self.time.x():
+            self.time.setPos(x, 0)
+
+
+class SequenceCurveView(QWidget):
+    """
+    Graph editor that plots the evaluated value of one track per component
+    over the same time range as the track view. Each segment between two
+    keyframes is sampled once and cached against its endpoints, so panning
+    and zooming only repaint and moving a keyframe only resamples the two
+    segments that touch it. Keyframe values can be dragged vertically.
+    """
+    trackChanged = Signal(str)
+    colors = {
+        'x': QColor(220, 90, 90),
+        'y': QColor(110, 200, 110),
+        'z': QColor(100, 140, 230),
+        'r': QColor(220, 90, 90),
+        'g': QColor(110, 200, 110),
+        'b': QColor(100, 140, 230),
+        'a': QColor(180, 180, 180),
+    }
+
+    def __init__(self, api, tracks):
+        QWidget.__init__(self)
+        self.api = api
+        self.tracks = tracks
+        self.name = 'cameraPosition'
+        self.cache = {}
+        self.drag = None
+        self.bounds = (0.0, 1.0)
+        self.setMinimumHeight(120)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+        self.tracks.rangeChanged.connect(self.update)
+        self.tracks.keyframesMoved.connect(self.update)
+        self.tracks.selectionChanged.connect(self.selectionChanged)
+        self.tracks.horizontalScrollBar().valueChanged.connect(self.update)
+        self.api.sequence.updated.connect(self.update)
+        self.api.sequence.dataLoaded.connect(self.reload)
+
+    def reload(self):
+        self.cache = {}
+        self.update()
+
+    def setTrack(self, name):
+        if name != self.name:
+            self.name = name
+            self.cache = {}
+            self.trackChanged.emit(name)
+            self.update()
+
+    def selectionChanged(self):
+        if self.drag is None:
+            selected = self.tracks.selection.first()
+            if selected is not None:
+                self.setTrack(selected.track.name)
+            self.update()
+
+    def track(self):
+        return self.tracks.tracks.get(self.name)
+
+    def timeToX(self, time):
+        return self.tracks.mapFromScene(QPointF(time * PRECISION, 0)).x()
+
+    def xToTime(self, x):
+        return self.tracks.mapToScene(QPoint(int(x), 0)).x() / PRECISION
+
+    def valueToY(self, value):
+        low, high = self.bounds
+        return 4 + (high - value) / (high - low) * (self.height() - 8)
+
+    def yToValue(self, y):
+        low, high = self.bounds
+        return high - (y - 4) / (self.height() - 8) * (high - low)
+
+    def segment(self, start, end, components):
+        """
+        Cached polylines for the segment between two keyframes, one per
+        component. The cache entry is reused until either endpoint's time,
+        value or blend changes.
+        """
+        signature = (start['time'], end['time'], repr(start['value']), repr(end['value']), start.get('blend'))
+        key = (id(start), id(end))
+        cached = self.cache.get(key)
+        if cached is None or cached[0] != signature:
+            t0, t1 = start['time'], end['time']
+            v0, v1 = flattenValue(start['value'], components), flattenValue(end['value'], components)
+            blend = BLENDS.get(start.get('blend'), linear)
+            if isinstance(start['value'], bool):
+                blend = snap
+            if blend is snap:
+                steps = [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0)]
+            elif blend is linear:
+                steps = [(0.0, 0.0), (1.0, 1.0)]
+            else:
+                steps = [(p / CURVE_SAMPLES, blend(p / CURVE_SAMPLES)) for p in range(CURVE_SAMPLES + 1)]
+            polygons = []
+            for a, b in zip(v0, v1):
+                polygons.append(QPolygonF([QPointF(t0 + (t1 - t0) * p, a + (b - a) * e) for p, e in steps]))
+            values = [point.y() for polygon in polygons for point in polygon]
+            cached = (signature, polygons, min(values), max(values))
+            self.cache[key] = cached
+        return cached
+
+    def visibleKeyframes(self, track):
+        keyframes = track.sortedKeyframes()
+        times = track.sortedTimes()
+        start = max(bisect_left(times, self.xToTime(0)) - 1, 0)
+        end = min(bisect_right(times, self.xToTime(self.width())) + 1, len(keyframes))
+        return keyframes[start:end]
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(30, 30, 30))
+        track = self.track()
+        keyframes = self.visibleKeyframes(track) if track is not None else []
+        if not keyframes:
+            return
+        if len(self.cache) > 4 * len(track.sortedKeyframes()) + 64:
+            self.cache = {}
+        components = valueComponents(keyframes[0]['value'])
+        names = components or (None,)
+        points = [flattenValue(keyframe['value'], components) for keyframe in keyframes]
+
+        # When keyframes are only a few pixels apart the eased shape between
+        # them is not visible, so draw straight through the keyframe values
+        dense = len(keyframes) * CURVE_DENSITY > self.width()
+        if dense:
+            segments = []
+            polylines = [[QPolygonF([QPointF(keyframe['time'], point[index]) for keyframe, point in zip(keyframes, points)])] for index in range(len(names))]
+        else:
+            segments = [self.segment(a, b, components) for a, b in zip(keyframes, keyframes[1:])]
+            polylines = [[cached[1][index] for cached in segments] for index in range(len(names))]
+        if self.drag is None:
+            values = [value for point in points for value in point]
+            low = min([cached[2] for cached in segments] + values)
+            high = max([cached[3] for cached in segments] + values)
+            if high - low < 1e-6:
+                low, high = low - 1, high + 1
+            self.bounds = (low, high)
+        low, high = self.bounds
+
+        # Map sequence time and value directly to widget pixels so the cached
+        # polylines can be drawn without being rebuilt
+        x0, x1 = self.timeToX(0), self.timeToX(1)
+        scaleY = -(self.height() - 8) / (high - low)
+        painter.setRenderHint(QPainter.Antialiasing, not dense)
+        painter.setTransform(QTransform(x1 - x0, 0, 0, scaleY, x0, 4 - high * scaleY))
+        first, last = points[0], points[-1]
+        left, right = self.xToTime(0), self.xToTime(self.width())
+        for index, name in enumerate(names):
+            pen = QPen(self.colors.get(name, QApplication.palette().highlight().color()), 1 if dense else 1.5)
+            pen.setCosmetic(True)
+            painter.setPen(pen)
+            painter.drawLine(QPointF(left, first[index]), QPointF(keyframes[0]['time'], first[index]))
+            painter.drawLine(QPointF(keyframes[-1]['time'], last[index]), QPointF(right, last[index]))
+            for polyline in polylines[index]:
+                painter.drawPolyline(polyline)
+        painter.resetTransform()
+        if dense:
+            return
+        selected = set(id(key.item) for key in self.tracks.selection.items)
+        for keyframe, point in zip(keyframes, points):
+            x = self.timeToX(keyframe['time'])
+            for index, value in enumerate(point):
+                color = QColor(255, 255, 255) if id(keyframe) in selected else self.colors.get(names[index], QColor(180, 180, 180))
+                painter.fillRect(QRectF(x - 3, self.valueToY(value) - 3, 6, 6), color)
+
+    def pick(self, position):
+        track = self.track()
+        if track is None:
+            return None
+        keyframes = self.visibleKeyframes(track)
+        if not keyframes:
+            return None
+        components = valueComponents(keyframes[0]['value'])
+        for keyframe in keyframes:
+            if abs(self.timeToX(keyframe['time']) - position.x()) <= CURVE_PICK:
+                for index, value in enumerate(flattenValue(keyframe['value'], components)):
+                    if abs(self.valueToY(value) - position.y()) <= CURVE_PICK:
+                        return keyframe, components, index
+        return None
+
+    def mousePressEvent(self, event):
+        picked = self.pick(event.position())
+        if event.button() == Qt.LeftButton and picked is not None:
+            keyframe, components, index = picked
+            item = self.track().keyframeItem(keyframe)
+            if not event.modifiers() & Qt.ShiftModifier:
+                self.tracks.scene.clearSelection()
+            item.setSelected(True)
+            if not isinstance(keyframe['value'], bool):
+                self.drag = (item, components, index)
+            event.accept()
+        else:
+            QWidget.mousePressEvent(self, event)
+
+    def mouseMoveEvent(self, event):
+        if self.drag is not None:
+            item, components, index = self.drag
+            value = self.yToValue(event.position().y())
+            if components is None:
+                item.item['value'] = value
+            else:
+                data = dict(item.item['value'])
+                data[components[index]] = value
+                item.item['value'] = data
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if self.drag is not None:
+            item = self.drag[0]
+            self.drag = None
+            item.update()
+            item.updateSelection()
+            self.api.sequence.update()
+        QWidget.mouseReleaseEvent(self, event)
 
 
 class SequenceCombo(QComboBox):
@@ -423,16 +955,24 @@ class SequenceCombo(QComboBox):
 
 
 class SequenceSelectedView(QWidget):
+    """
+    Inspector for the selected keyframes. It is driven by the aggregates of
+    the track view's selection and only touches its editors when those
+    aggregates or the playback length change.
+    """
+
     def __init__(self, api, tracks):
         QWidget.__init__(self)
         self.api = api
-        self.api.playback.updated.connect(self.update)
-        self.api.sequence.updated.connect(self.update)
+        self.api.playback.updated.connect(self.updateLength)
         self.tracks = tracks
         self.tracks.selectionChanged.connect(self.update)
+        self.summary = None
+        self.length = None
         self.form = QFormLayout(self)
         self.setLayout(self.form)
         self.layout()
+        self.updateLength()
         self.update()
 
     def layout(self):
@@ -474,58 +1014,40 @@ class SequenceSelectedView(QWidget):
     def openBlendHelp(self):
         threading.Thread(target=lambda: webbrowser.open_new('https://easings.net')).start()
 
+    def updateLength(self):
+        if self.api.playback.length != self.length:
+            self.length = self.api.playback.length
+            self.time.setRange(0, self.length)
+
     def update(self):
-        selected = self.tracks.selectedKeyframes()
-        self.setVisible(len(selected))
-        self.time.setRange(0, self.api.playback.length)
-
-        blending = list(set([key.blend for key in selected]))
-        self.label.setText("{} keyframes selected".format(len(selected)))
-        if len(blending) == 1:
-            self.blend.setCurrentText(blending[0])
+        summary = self.tracks.selection.summary()
+        if summary == self.summary:
+            return
+        self.summary = summary
+        count, blend, time, valueType, value, earliest, latest = summary
+        self.setVisible(count > 0)
+        self.label.setText("{} keyframes selected".format(count))
+        if blend is not None:
+            self.blend.setCurrentText(blend)
         else:
             self.blend.setCurrentIndex(-1)
 
-        times = list(set([key.time for key in selected]))
-        if len(times):
-            self.time.update(times[0])
-
-        if len(set([key.valueType for key in selected])) == 1:
-            valueType = selected[0].valueType
-            if valueType == 'float':
-                self.valueFloat.update(selected[0].value)
-                self.valueLabel.setVisible(False)
-                self.valueFloat.setVisible(True)
-                self.valueBool.setVisible(False)
-                self.valueVector.setVisible(False)
-                self.valueColor.setVisible(False)
-            elif valueType == 'bool':
-                self.valueBool.update(selected[0].value)
-                self.valueLabel.setVisible(False)
-                self.valueFloat.setVisible(False)
-                self.valueBool.setVisible(True)
-                self.valueVector.setVisible(False)
-                self.valueColor.setVisible(False)
-            elif valueType == 'vector':
-                self.valueVector.update(selected[0].value)
-                self.valueLabel.setVisible(False)
-                self.valueFloat.setVisible(False)
-                self.valueBool.setVisible(False)
-                self.valueVector.setVisible(True)
-                self.valueColor.setVisible(False)
-            elif valueType == 'color':
-                self.valueColor.update(selected[0].value)
-                self.valueLabel.setVisible(False)
-                self.valueFloat.setVisible(False)
-                self.valueBool.setVisible(False)
-                self.valueVector.setVisible(False)
-                self.valueColor.setVisible(True)
-        else:
-            self.valueLabel.setVisible(True)
-            self.valueFloat.setVisible(False)
-            self.valueBool.setVisible(False)
-            self.valueVector.setVisible(False)
-            self.valueColor.setVisible(False)
+        if count:
+            self.time.update(time if time is not None else earliest)
+
+        if valueType == 'float':
+            self.valueFloat.update(value)
+        elif valueType == 'bool':
+            self.valueBool.update(value)
+        elif valueType == 'vector':
+            self.valueVector.update(value)
+        elif valueType == 'color':
+            self.valueColor.update(value)
+        self.valueLabel.setVisible(valueType not in ('float', 'bool', 'vector', 'color'))
+        self.valueFloat.setVisible(valueType == 'float')
+        self.valueBool.setVisible(valueType == 'bool')
+        self.valueVector.setVisible(valueType == 'vector')
+        self.valueColor.setVisible(valueType == 'color')
 
     def updateTime(self):
         for item in self.tracks.selectedKeyframes():
@@ -1,12 +1,25 @@
 import os
 import json
+import logging
+import threading
+import contextlib
 from leaguedirector.widgets import userpath
 
 class Settings(object):
+    """
+    Values are written to config.json in batches. A write is skipped when
+    the serialized content has not changed and otherwise happens on a
+    background thread through a temporary file that is renamed over the
+    old one, so a crash never leaves a truncated config behind.
+    """
 
     def __init__(self):
         self.data = {}
         self.path = userpath('config.json')
+        self.batching = 0
+        self.content = None
+        self.lock = threading.Lock()
+        self.thread = None
         self.loadFile()
 
     def value(self, key, default=None):
@@ -14,13 +27,50 @@ class Settings(object):
 
     def setValue(self, key, value):
         self.data[key] = value
-        self.saveFile()
+        if not self.batching:
+            self.saveFile()
+
+    @contextlib.contextmanager
+    def batch(self):
+        self.batching += 1
+        try:
+            yield self
+        finally:
+            self.batching -= 1
+            if not self.batching:
+                self.saveFile()
+
+    def serialize(self):
+        return json.dumps(self.data, sort_keys=True, indent=4)
 
     def saveFile(self):
-        with open(self.path, 'w') as f:
-            json.dump(self.data, f, sort_keys=True, indent=4)
+        content = self.serialize()
+        if content != self.content:
+            self.content = content
+            self.thread = threading.Thread(target=self.writeFile, args=(content,))
+            self.thread.start()
+
+    def writeFile(self, content):
+        with self.lock:
+            # A newer save has been requested since this one was started
+            if content is not self.content:
+                return
+            temp = self.path + '.tmp'
+            try:
+                with open(temp, 'w') as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp, self.path)
+            except OSError as error:
+                logging.error('Unable to save settings: {}'.format(error))
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
 
     def loadFile(self):
         if os.path.isfile(self.path):
             with open(self.path, 'r') as f:
                 self.data = json.load(f)
+            self.content = self.serialize()
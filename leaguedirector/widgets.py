@@ -2,15 +2,45 @@ import os
 from PySide6.QtGui import *
 from PySide6.QtCore import *
 from PySide6.QtWidgets import *
+from leaguedirector.monitor import monitor
 
 
 def schedule(interval, callback):
     timer = QTimer()
-    timer.timeout.connect(callback)
+    timer.timeout.connect(monitor.wrap(callback))
     timer.start(interval)
     return timer
 
 
+class AnimationClock(QAbstractAnimation):
+    """
+    Shared per frame tick driven by Qt's animation timer, which follows the
+    display refresh. The clock only runs while at least one reason to
+    animate is active so an idle window costs nothing.
+    """
+    tick = Signal()
+
+    def __init__(self):
+        QAbstractAnimation.__init__(self)
+        self.reasons = set()
+
+    def duration(self):
+        return -1
+
+    def updateCurrentTime(self, time):
+        monitor.measure('AnimationClock.tick', self.tick.emit)
+
+    def setActive(self, reason, active):
+        if active:
+            self.reasons.add(reason)
+        else:
+            self.reasons.discard(reason)
+        if self.reasons and self.state() != QAbstractAnimation.Running:
+            self.start()
+        elif not self.reasons and self.state() == QAbstractAnimation.Running:
+            self.stop()
+
+
 def respath(*args):
     directory = os.path.abspath(os.path.join(os.curdir, 'resources'))
     return os.path.join(directory, *args)
@@ -28,6 +58,28 @@ def userpath(*args):
     return path
 
 
+def cachedPixmap(name, ratio=None):
+    """
+    Load a pixmap from the resources directory once and share it through
+    the process wide QPixmapCache. Entries are keyed by device pixel ratio
+    so a @2x variant is used on high dpi screens when one is available.
+    """
+    if ratio is None:
+        ratio = QGuiApplication.instance().devicePixelRatio()
+    key = '{}@{}'.format(name, ratio)
+    pixmap = QPixmapCache.find(key)
+    if pixmap is None:
+        base, ext = os.path.splitext(name)
+        path = respath('{}@2x{}'.format(base, ext))
+        if ratio > 1 and os.path.isfile(path):
+            pixmap = QPixmap(path)
+            pixmap.setDevicePixelRatio(2)
+        else:
+            pixmap = QPixmap(respath(name))
+        QPixmapCache.insert(key, pixmap)
+    return pixmap
+
+
 def default(value1, value2):
     return value1 if value1 is not None else value2
 
@@ -65,6 +117,89 @@ class VBoxWidget(QWidget):
         self.layout.addWidget(widget)
 
 
+class Throttle(QObject):
+    """
+    Passes values on to a callback at most once per interval. The first
+    value goes out straight away, later ones replace each other until the
+    interval elapses and the latest is sent then, or sooner on flush().
+    Idle is emitted once an interval passes with nothing left to send.
+    """
+    idle = Signal()
+
+    def __init__(self, callback, parent=None):
+        QObject.__init__(self, parent)
+        self.callback = callback
+        self.interval = 0
+        self.value = None
+        self.dirty = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.expire)
+
+    def setRate(self, rate):
+        self.interval = int(1000 / rate) if rate else 0
+
+    def busy(self):
+        return self.dirty or self.timer.isActive()
+
+    def cancel(self):
+        self.dirty = False
+        self.timer.stop()
+
+    def push(self, value):
+        self.value = value
+        self.dirty = True
+        if not self.timer.isActive():
+            self.flush()
+
+    def flush(self):
+        if self.dirty:
+            self.dirty = False
+            self.callback(self.value)
+            if self.interval:
+                self.timer.start(self.interval)
+
+    def expire(self):
+        if self.dirty:
+            self.flush()
+        else:
+            self.idle.emit()
+
+
+class FieldBinding(QObject):
+    """
+    Keeps an input widget in sync with a resource field. Values from the
+    resource are shown without emitting valueChanged. While the widget is
+    in the middle of a rate limited edit only the latest is kept, and shown
+    once the edit settles. The widget only writes values that differ from
+    the field.
+    """
+
+    def __init__(self, widget, resource, name):
+        QObject.__init__(self, widget)
+        self.widget = widget
+        self.resource = resource
+        self.name = name
+        self.value = resource.get(name)
+        self.widget.valueChanged.connect(self.write)
+        self.resource.field(name).changed.connect(self.read)
+        self.widget.live.idle.connect(self.settle)
+        self.widget.update(self.value)
+
+    def read(self, value):
+        self.value = value
+        if not self.widget.live.busy():
+            self.widget.update(value)
+
+    def settle(self):
+        self.widget.update(self.value)
+
+    def write(self, value):
+        if value != self.value:
+            self.value = value
+            self.resource.set(self.name, value)
+
+
 class FloatSlider(QWidget):
     valueChanged = Signal(float)
 
@@ -78,8 +213,11 @@ class FloatSlider(QWidget):
         self.slider.setTracking(True)
         self.input = QDoubleSpinBox()
 
+        self.live = Throttle(self.valueChanged.emit, self)
         self.slider.valueChanged.connect(self.sliderValueChanged)
+        self.slider.sliderReleased.connect(self.live.flush)
         self.input.valueChanged.connect(self.inputValueChanged)
+        self.input.editingFinished.connect(self.live.flush)
 
         self.layout = QHBoxLayout()
         self.layout.setContentsMargins(0, 0, 0, 0)
@@ -93,14 +231,21 @@ class FloatSlider(QWidget):
         self.input.blockSignals(True)
         self.input.setValue(value)
         self.input.blockSignals(False)
-        self.valueChanged.emit(value)
+        self.emitValue(value)
 
     def inputValueChanged(self):
         value = self.input.value()
         self.slider.blockSignals(True)
         self.slider.setValue(value * self.precision)
         self.slider.blockSignals(False)
-        self.valueChanged.emit(value)
+        self.emitValue(value)
+
+    def setLiveRate(self, rate):
+        self.live.setRate(rate)
+
+    def emitValue(self, value):
+        if not self.signalsBlocked():
+            self.live.push(value)
 
     def setRange(self, min_value, max_value):
         self.slider.setRange(min_value * self.precision, max_value * self.precision)
@@ -130,8 +275,10 @@ class FloatInput(QWidget):
         QWidget.__init__(self)
         self.range = None
         self.step = None
+        self.live = Throttle(self.valueChanged.emit, self)
         self.spin = QDoubleSpinBox()
         self.spin.valueChanged.connect(self.handleValueChanged)
+        self.spin.editingFinished.connect(self.live.flush)
         self.layout = QHBoxLayout()
         self.layout.setContentsMargins(0, 0, 0, 0)
         self.layout.addWidget(self.spin)
@@ -141,7 +288,14 @@ class FloatInput(QWidget):
     def handleValueChanged(self, value):
         self.applyRelativeRange()
         self.applyRelativeStep()
-        self.valueChanged.emit(value)
+        self.emitValue(value)
+
+    def setLiveRate(self, rate):
+        self.live.setRate(rate)
+
+    def emitValue(self, value):
+        if not self.signalsBlocked():
+            self.live.push(value)
 
     def update(self, value):
         if not self.spin.hasFocus():
@@ -191,6 +345,7 @@ class BooleanInput(QWidget):
 
     def __init__(self, text=''):
         QWidget.__init__(self)
+        self.live = Throttle(self.valueChanged.emit, self)
         self.checkbox = QCheckBox(text)
         self.checkbox.stateChanged.connect(self.handleValueChanged)
         self.label = QLabel('')
@@ -201,7 +356,14 @@ class BooleanInput(QWidget):
         self.setLayout(self.layout)
 
     def handleValueChanged(self, state):
-        self.valueChanged.emit(bool(state == Qt.Checked.value))
+        self.emitValue(bool(state == Qt.Checked.value))
+
+    def setLiveRate(self, rate):
+        self.live.setRate(rate)
+
+    def emitValue(self, value):
+        if not self.signalsBlocked():
+            self.live.push(value)
 
     def update(self, value):
         self.blockSignals(True)
@@ -234,9 +396,10 @@ class VectorInput(QWidget):
         self.x = QDoubleSpinBox()
         self.y = QDoubleSpinBox()
         self.z = QDoubleSpinBox()
-        self.x.valueChanged.connect(self.handleValueChanged)
-        self.y.valueChanged.connect(self.handleValueChanged)
-        self.z.valueChanged.connect(self.handleValueChanged)
+        self.live = Throttle(self.valueChanged.emit, self)
+        for spin in (self.x, self.y, self.z):
+            spin.valueChanged.connect(self.handleValueChanged)
+            spin.editingFinished.connect(self.live.flush)
         self.layout = QHBoxLayout()
         self.layout.setContentsMargins(0, 0, 0, 0)
         self.layout.addWidget(self.x)
@@ -250,7 +413,14 @@ class VectorInput(QWidget):
     def handleValueChanged(self, value):
         self.applyRelativeRange()
         self.applyRelativeStep()
-        self.valueChanged.emit(self.value())
+        self.emitValue(self.value())
+
+    def setLiveRate(self, rate):
+        self.live.setRate(rate)
+
+    def emitValue(self, value):
+        if not self.signalsBlocked():
+            self.live.push(value)
 
     def update(self, value):
         if not self.x.hasFocus() and not self.y.hasFocus() and not self.z.hasFocus():
@@ -334,10 +504,10 @@ class ColorInput(QWidget):
         self.g.setRange(0, 255)
         self.b.setRange(0, 255)
         self.a.setRange(0, 255)
-        self.r.valueChanged.connect(self.handleValueChanged)
-        self.g.valueChanged.connect(self.handleValueChanged)
-        self.b.valueChanged.connect(self.handleValueChanged)
-        self.a.valueChanged.connect(self.handleValueChanged)
+        self.live = Throttle(self.valueChanged.emit, self)
+        for spin in (self.r, self.g, self.b, self.a):
+            spin.valueChanged.connect(self.handleValueChanged)
+            spin.editingFinished.connect(self.live.flush)
         self.dialog.currentColorChanged.connect(self.handleColorPicked)
         self.button.clicked.connect(self.dialog.show)
         self.layout = QHBoxLayout()
@@ -352,7 +522,7 @@ class ColorInput(QWidget):
     def handleValueChanged(self, value):
         self.palette.setColor(QPalette.Button, self.color())
         self.button.setPalette(self.palette)
-        self.valueChanged.emit(self.value())
+        self.emitValue(self.value())
 
     def handleColorPicked(self):
         self.blockSignals(True)
@@ -362,7 +532,14 @@ class ColorInput(QWidget):
         self.b.setValue(color.blue())
         self.a.setValue(color.alpha())
         self.blockSignals(False)
-        self.valueChanged.emit(self.value())
+        self.emitValue(self.value())
+
+    def setLiveRate(self, rate):
+        self.live.setRate(rate)
+
+    def emitValue(self, value):
+        if not self.signalsBlocked():
+            self.live.push(value)
 
     def update(self, value):
         if not self.r.hasFocus() and not self.g.hasFocus() and not self.b.hasFocus() and not self.a.hasFocus():